@@ -0,0 +1,498 @@
+"""
+Bulk import / backfill of shops, usage and webhook history
+
+Loads NDJSON or CSV (e.g. files produced by /api/admin/export) in batches.
+Each batch is copied into a temporary staging table with COPY FROM STDIN
+and merged into the live table with one INSERT ... SELECT, in a single
+transaction. The same transaction updates the import's row in
+bulk_import_checkpoints with how many input records are done, so an
+interrupted import resumes exactly where it stopped.
+
+Import shops first: usage and webhook rows for unknown shops are skipped.
+Ids are never imported. Rows get new ids from the live sequences. Shops
+are matched on shop_domain (--on-conflict chooses skip or update) and
+webhook events on webhook_id (existing events are kept). Usage rows have no
+natural key, so importing the same usage twice duplicates it: --restart is
+refused once a usage import has made progress.
+
+Empty CSV fields are empty strings in text columns and NULL in other
+columns (where an empty string is not a value). Columns missing from the
+input are NULL.
+
+The imported columns are the CSV header, or the union of keys across all
+NDJSON records (one extra pass over the file), unless --columns is given.
+
+Usage:
+    python -m app.bulk_import shops shops.csv
+    python -m app.bulk_import webhook_events events.ndjson --batch-size 50000
+"""
+
+from psycopg.types.json import Json
+from sqlalchemy import (
+    String,
+    Table,
+    column,
+    delete,
+    exists,
+    func,
+    literal,
+    literal_column,
+    select,
+    table,
+    text,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql import ColumnElement
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import time
+
+from app.database import engine
+from app.models import BulkImportCheckpoint, Shop, ShopUsage, WebhookEvent
+from app.utils.json_codec import loads
+from app.utils.pg_copy import copy_rows_in
+
+logger = logging.getLogger(__name__)
+
+STAGING_TABLE = "bulk_import_staging"
+IMPORT_FORMATS = ("ndjson", "csv")
+CONFLICT_MODES = ("skip", "update")
+
+
+def _utc_now() -> ColumnElement:
+    return func.timezone("UTC", func.now())
+
+
+class ImportTarget:
+    """How records are merged into one live table"""
+
+    def __init__(
+        self,
+        table: Table,
+        required: Sequence[str],
+        defaults: Dict[str, ColumnElement],
+        conflict_key: Optional[str] = None,
+        updatable: bool = True,
+        requires_shop: bool = False,
+    ):
+        self.table = table
+        self.required = tuple(required)
+        # SQL fallbacks for NOT NULL columns, applied when a column is missing
+        # from the input or NULL in a record (an explicit NULL would bypass
+        # the server default)
+        self.defaults = defaults
+        self.conflict_key = conflict_key
+        # --on-conflict update is allowed (the conflict key is never NULL)
+        self.updatable = updatable
+        self.requires_shop = requires_shop
+
+    @property
+    def importable_columns(self) -> List[str]:
+        return [c.name for c in self.table.columns if not c.primary_key]
+
+    @property
+    def text_columns(self) -> List[str]:
+        return [c.name for c in self.table.columns if isinstance(c.type, String)]
+
+
+IMPORT_TARGETS = {
+    "shops": ImportTarget(
+        Shop.__table__,
+        required=("shop_domain",),
+        defaults={
+            "installed_at": _utc_now(),
+            "last_seen_at": _utc_now(),
+            "uninstalled": literal(False),
+            "subscription_status": literal("trial"),
+            "app_settings": literal_column("'{}'::jsonb"),
+            "settings_version": literal(0),
+            "created_at": func.now(),
+            "updated_at": func.now(),
+        },
+        conflict_key="shop_domain",
+    ),
+    "shop_usage": ImportTarget(
+        ShopUsage.__table__,
+        required=("shop_domain", "metric_name"),
+        defaults={
+            "metric_value": literal(0),
+            "date": func.now(),
+            "created_at": func.now(),
+        },
+        requires_shop=True,
+    ),
+    "webhook_events": ImportTarget(
+        WebhookEvent.__table__,
+        required=("shop_domain", "topic"),
+        defaults={"processed": literal(False), "received_at": func.now()},
+        conflict_key="webhook_id",
+        updatable=False,
+        requires_shop=True,
+    ),
+}
+
+
+def read_records(path: str, fmt: str, skip: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Read records from an NDJSON or CSV file
+
+    Args:
+        path: Input file
+        fmt: 'ndjson' or 'csv' (CSV values are strings, missing fields None)
+        skip: Records to skip (already imported)
+
+    Yields:
+        dict: Column name -> value
+    """
+    if fmt == "ndjson":
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                yield loads(line)
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if skip:
+                    skip -= 1
+                    continue
+                yield row
+
+
+def read_columns(path: str, fmt: str) -> List[str]:
+    """
+    Columns present in an input file
+
+    Returns:
+        list: CSV header, or every key used by any NDJSON record in first-seen
+            order
+    """
+    if fmt == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            return next(csv.reader(f), [])
+
+    columns: Dict[str, None] = {}
+    for record in read_records(path, fmt):
+        columns.update(dict.fromkeys(record))
+    return list(columns)
+
+
+def _copy_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return Json(value)
+    return value
+
+
+def merge_statement(target: ImportTarget, columns: Sequence[str], on_conflict: str):
+    """
+    Build the INSERT ... SELECT from the staging table into the live table
+
+    Args:
+        target: Import target
+        columns: Columns present in the staging table
+        on_conflict: 'skip' or 'update' (updatable tables with a conflict key)
+
+    Returns:
+        Insert: Merge statement
+    """
+    staging = table(STAGING_TABLE, *(column(name) for name in columns))
+    names = list(columns) + [name for name in target.defaults if name not in columns]
+
+    values = []
+    for name in names:
+        default = target.defaults.get(name)
+        if name not in columns:
+            values.append(default)
+        elif default is not None:
+            values.append(func.coalesce(staging.c[name], default))
+        else:
+            values.append(staging.c[name])
+
+    source = select(*values).select_from(staging)
+    if target.requires_shop:
+        source = source.where(
+            exists().where(Shop.shop_domain == staging.c.shop_domain)
+        )
+    if target.conflict_key and on_conflict == "update":
+        # Last occurrence in the batch wins (ON CONFLICT cannot touch a row
+        # twice; DO NOTHING keeps the first one)
+        key = staging.c[target.conflict_key]
+        source = source.distinct(key).order_by(key, literal_column("ctid").desc())
+
+    stmt = insert(target.table).from_select(names, source)
+    if not target.conflict_key:
+        return stmt
+    if on_conflict == "update":
+        updates = {
+            name: stmt.excluded[name]
+            for name in columns
+            if name != target.conflict_key
+        }
+        if "updated_at" in target.table.c and "updated_at" not in columns:
+            updates["updated_at"] = _utc_now()
+        return stmt.on_conflict_do_update(
+            index_elements=[target.conflict_key], set_=updates
+        )
+    return stmt.on_conflict_do_nothing(index_elements=[target.conflict_key])
+
+
+async def load_checkpoint(source: str, table_name: str) -> Dict[str, Any]:
+    """Read an import's progress, or start from zero"""
+    async with engine.connect() as conn:
+        row = (
+            await conn.execute(
+                select(BulkImportCheckpoint.records, BulkImportCheckpoint.merged)
+                .where(BulkImportCheckpoint.source == source)
+                .where(BulkImportCheckpoint.table_name == table_name)
+            )
+        ).one_or_none()
+    return {
+        "source": source,
+        "table": table_name,
+        "records": row.records if row else 0,
+        "merged": row.merged if row else 0,
+    }
+
+
+async def delete_checkpoint(source: str, table_name: str):
+    """Forget an import's progress (--restart)"""
+    async with engine.begin() as conn:
+        await conn.execute(
+            delete(BulkImportCheckpoint)
+            .where(BulkImportCheckpoint.source == source)
+            .where(BulkImportCheckpoint.table_name == table_name)
+        )
+
+
+def checkpoint_statement(state: Dict[str, Any]):
+    """Upsert an import's progress"""
+    stmt = insert(BulkImportCheckpoint).values(
+        source=state["source"],
+        table_name=state["table"],
+        records=state["records"],
+        merged=state["merged"],
+        updated_at=func.now(),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["source", "table_name"],
+        set_={
+            "records": stmt.excluded.records,
+            "merged": stmt.excluded.merged,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+
+async def import_batch(
+    target: ImportTarget,
+    columns: Sequence[str],
+    rows: List[tuple],
+    on_conflict: str,
+    statement_timeout_ms: int,
+    state: Dict[str, Any],
+) -> int:
+    """
+    Copy one batch into staging, merge it and advance the checkpoint, in one
+    transaction (`state` is only updated once it has committed)
+
+    Returns:
+        int: Rows inserted or updated in the live table
+    """
+    quote = engine.dialect.identifier_preparer.quote
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}")
+        )
+        await conn.execute(
+            text(
+                f"CREATE TEMPORARY TABLE {quote(STAGING_TABLE)} ON COMMIT DROP AS "
+                f"SELECT {', '.join(quote(name) for name in columns)} "
+                f"FROM {quote(target.table.name)} WITH NO DATA"
+            )
+        )
+        await copy_rows_in(conn, STAGING_TABLE, columns, rows)
+        result = await conn.execute(merge_statement(target, columns, on_conflict))
+        merged = result.rowcount
+        await conn.execute(
+            checkpoint_statement(
+                {
+                    **state,
+                    "records": state["records"] + len(rows),
+                    "merged": state["merged"] + merged,
+                }
+            )
+        )
+
+    state["records"] += len(rows)
+    state["merged"] += merged
+    return merged
+
+
+async def run_import(
+    table_name: str,
+    path: str,
+    fmt: str,
+    batch_size: int = 50000,
+    columns: Optional[Sequence[str]] = None,
+    checkpoint: Optional[str] = None,
+    on_conflict: str = "skip",
+    restart: bool = False,
+    statement_timeout_ms: int = 600000,
+) -> Dict[str, Any]:
+    """
+    Import a file into one table, resuming from its checkpoint
+
+    Args:
+        table_name: 'shops', 'shop_usage' or 'webhook_events'
+        path: Input file
+        fmt: 'ndjson' or 'csv'
+        batch_size: Records per transaction
+        columns: Columns to import (default: all columns in the file)
+        checkpoint: Checkpoint name (default: the input file's absolute path)
+        on_conflict: 'skip' or 'update' existing shops
+        restart: Ignore an existing checkpoint (not for tables without a
+            conflict key)
+        statement_timeout_ms: Statement timeout per batch (0 = none)
+
+    Returns:
+        dict: Final checkpoint state
+
+    Raises:
+        ValueError: If the table is unknown, the input lacks required columns,
+            the table cannot be updated or a restart would duplicate rows
+    """
+    target = IMPORT_TARGETS.get(table_name)
+    if target is None:
+        raise ValueError(f"Unknown table: {table_name}")
+
+    importable = target.importable_columns
+    found = list(columns) if columns else read_columns(path, fmt)
+    columns = [name for name in found if name in importable]
+    ignored = [name for name in found if name not in importable]
+    if ignored:
+        logger.warning("Ignoring columns: %s", ", ".join(ignored))
+    missing = [name for name in target.required if name not in columns]
+    if missing:
+        raise ValueError(f"Input is missing required columns: {', '.join(missing)}")
+    if on_conflict == "update" and not target.updatable:
+        raise ValueError(f"--on-conflict update is not supported for {table_name}")
+
+    source = checkpoint or os.path.abspath(path)
+    state = await load_checkpoint(source, table_name)
+    if restart and state["records"]:
+        if not target.conflict_key:
+            raise ValueError(
+                f"{table_name} has no natural key: restarting would import the "
+                f"first {state['records']} records again"
+            )
+        await delete_checkpoint(source, table_name)
+        state = await load_checkpoint(source, table_name)
+    if state["records"]:
+        logger.info("Resuming after %d records", state["records"])
+
+    # Empty CSV fields in non-text columns (timestamps, numbers, JSON)
+    blank_is_null = [
+        fmt == "csv" and name not in target.text_columns for name in columns
+    ]
+
+    def batches() -> Iterator[List[tuple]]:
+        batch = []
+        for record in read_records(path, fmt, skip=state["records"]):
+            values = (record.get(name) for name in columns)
+            batch.append(
+                tuple(
+                    None if blank and value == "" else _copy_value(value)
+                    for value, blank in zip(values, blank_is_null)
+                )
+            )
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    started = time.perf_counter()
+    imported = 0
+    for batch in batches():
+        merged = await import_batch(
+            target, columns, batch, on_conflict, statement_timeout_ms, state
+        )
+
+        imported += len(batch)
+        logger.info(
+            "%s: %d records done (%d merged, %d skipped in batch), %.0f records/s",
+            table_name,
+            state["records"],
+            merged,
+            len(batch) - merged,
+            imported / (time.perf_counter() - started),
+        )
+
+    await engine.dispose()
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("table", choices=sorted(IMPORT_TARGETS))
+    parser.add_argument("path", help="NDJSON or CSV file")
+    parser.add_argument(
+        "--format", choices=IMPORT_FORMATS, help="Default: from the file extension"
+    )
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument(
+        "--columns", help="Comma-separated columns (default: all in the file)"
+    )
+    parser.add_argument(
+        "--checkpoint", help="Checkpoint name (default: the file's absolute path)"
+    )
+    parser.add_argument("--restart", action="store_true", help="Ignore checkpoint")
+    parser.add_argument(
+        "--on-conflict",
+        choices=CONFLICT_MODES,
+        default="skip",
+        help="Existing shops: keep them or update the imported columns",
+    )
+    parser.add_argument("--statement-timeout-ms", type=int, default=600000)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    try:
+        state = asyncio.run(
+            run_import(
+                args.table,
+                args.path,
+                fmt,
+                batch_size=args.batch_size,
+                columns=(
+                    [name.strip() for name in args.columns.split(",") if name.strip()]
+                    if args.columns
+                    else None
+                ),
+                checkpoint=args.checkpoint,
+                on_conflict=args.on_conflict,
+                restart=args.restart,
+                statement_timeout_ms=args.statement_timeout_ms,
+            )
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    logger.info(
+        "%s: import finished, %d records read, %d merged",
+        state["table"],
+        state["records"],
+        state["merged"],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,31 @@ import os
 class Settings(BaseSettings):
     # Database
     database_url: str
+    database_read_url: str = ""  # Replica for analytics (defaults to primary)
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout_seconds: float = 10.0
+    db_pool_recycle_seconds: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 15000
+    db_idle_in_transaction_timeout_ms: int = 60000
+    db_read_pool_size: int = 5
+    db_read_max_overflow: int = 5
+    db_read_statement_timeout_ms: int = 60000
+    # Server-side prepared statements (psycopg prepares a statement after it has
+    # run `db_prepare_threshold` times on a connection). Disable behind
+    # PgBouncer in transaction pooling mode.
+    db_prepared_statements: bool = True
+    db_prepare_threshold: int = 2
+    db_prepared_max: int = 200  # Prepared statements kept per connection
+    db_warm_statement_cache: bool = True  # Compile hot query shapes at startup
     
     # Shopify App Configuration
     shopify_api_key: str
     shopify_api_secret: str
+    # Comma-separated previous secrets still accepted for HMAC checks while
+    # rotating
+    shopify_api_previous_secrets: str = ""
     shopify_scopes: str = "read_products"
     
     # App Configuration
@@ -23,6 +44,89 @@ class Settings(BaseSettings):
     # JWT Configuration
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    session_token_cache_size: int = 4096
+
+    # OAuth state ("database" stores states in oauth_states, "signed" uses
+    # stateless HMAC-signed tokens)
+    oauth_state_mode: str = "database"
+    oauth_state_ttl_seconds: int = 600
+
+    # Response compression
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
+    compression_threadpool_min_size: int = 256 * 1024
+    compression_excluded_paths: str = ""  # Comma-separated path prefixes
+
+    # Webhooks
+    webhook_max_body_bytes: int = 5 * 1024 * 1024
+
+    # Background maintenance (expired OAuth states, stale webhook events)
+    maintenance_enabled: bool = True
+    maintenance_interval_seconds: int = 300
+    maintenance_batch_size: int = 1000
+    maintenance_max_batches: int = 50
+    maintenance_requeue_concurrency: int = 4  # Handlers run at once per sweep
+    webhook_stale_after_seconds: int = 900
+
+    # Last-seen tracking (write-behind)
+    last_seen_precision_seconds: int = 60
+    last_seen_flush_interval_seconds: float = 30.0
+
+    # Logging
+    log_level: str = "INFO"
+    log_format: str = "json"  # "json" or "text"
+    log_queue_size: int = 10000
+    log_sample_limit: int = 20  # Per shop/topic/message per window, 0 disables
+    log_sample_window_seconds: float = 60.0
+    database_echo: bool = False  # Log every SQL statement
+
+    # Shop credentials cache and batched usage writes
+    shop_credentials_cache_ttl_seconds: float = 60.0
+    usage_flush_interval_seconds: float = 5.0
+    usage_batch_size: int = 500
+    usage_max_pending: int = 10000
+
+    # Readiness probe (/health/ready)
+    health_cache_seconds: float = 2.0
+    health_db_timeout_seconds: float = 1.0
+    health_max_pool_utilization: float = 0.9
+    health_max_loop_lag_seconds: float = 0.25
+    health_max_webhook_backlog: int = 1000
+
+    # SQL statement statistics
+    query_stats_enabled: bool = True
+    query_budget_per_request: int = 25
+    # Comma-separated per-route budgets, e.g. "GET /api/products=6"
+    query_route_budgets: str = ""
+    query_n_plus_one_threshold: int = 5  # Same fingerprint this often per request
+    slow_query_ms: int = 200
+    query_stats_max_fingerprints: int = 1000
+
+    # Request tracing
+    tracing_enabled: bool = True
+    tracing_sample_rate: float = 0.01  # Fraction of requests traced
+    tracing_buffer_size: int = 200  # Recent traces kept for /api/admin/traces
+    tracing_file_path: str = ""  # Also append traces as JSON lines if set
+    tracing_excluded_paths: str = "/health,/metrics"
+
+    # On-demand profiler (/admin/profile, admin token required)
+    profiler_enabled: bool = False
+    profiler_max_seconds: int = 30
+    profiler_sample_interval_seconds: float = 0.005
+
+    # Event loop lag monitor
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval_seconds: float = 0.5
+    loop_monitor_slow_callback_seconds: float = 0.1
+    loop_monitor_window: int = 1200  # Lag samples kept for percentiles
+
+    # CSV exports (/api/admin/export, admin token required)
+    export_max_concurrent: int = 2  # Per worker; each holds a read connection
+    export_chunk_size: int = 64 * 1024
+    export_statement_timeout_ms: int = 30 * 60 * 1000
     
     class Config:
         env_file = ".env"
@@ -33,6 +137,34 @@ class Settings(BaseSettings):
         """Convert comma-separated origins to list"""
         return [origin.strip() for origin in self.allowed_origins.split(",")]
     
+    @property
+    def compression_excluded_paths_list(self) -> List[str]:
+        """Convert comma-separated path prefixes to list"""
+        return [
+            path.strip()
+            for path in self.compression_excluded_paths.split(",")
+            if path.strip()
+        ]
+    
+    @property
+    def tracing_excluded_paths_list(self) -> List[str]:
+        """Convert comma-separated path prefixes to list"""
+        return [
+            path.strip()
+            for path in self.tracing_excluded_paths.split(",")
+            if path.strip()
+        ]
+    
+    @property
+    def shopify_api_secrets_list(self) -> List[str]:
+        """Current API secret followed by previous secrets still accepted"""
+        previous = [
+            secret.strip()
+            for secret in self.shopify_api_previous_secrets.split(",")
+            if secret.strip()
+        ]
+        return [self.shopify_api_secret] + previous
+    
     @property
     def shopify_scopes_list(self) -> List[str]:
         """Convert comma-separated scopes to list"""
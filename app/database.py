@@ -1,21 +1,128 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from typing import Optional
 from app.config import settings
+from app.utils.json_codec import dumps_str, loads
+from app.utils.metrics import registry
+from app.utils import query_stats, tracing
+from app.utils.statement_timing import instrument_engine
 
-# Create async engine
-engine = create_async_engine(
+
+def _connect_args(statement_timeout_ms: int, read_only: bool = False) -> dict:
+    """Server-side session settings applied to every new connection"""
+    options = [
+        f"-c statement_timeout={statement_timeout_ms}",
+        f"-c idle_in_transaction_session_timeout="
+        f"{settings.db_idle_in_transaction_timeout_ms}",
+    ]
+    if read_only:
+        options.append("-c default_transaction_read_only=on")
+    return {
+        "options": " ".join(options),
+        # None disables psycopg's automatic prepared statements
+        "prepare_threshold": (
+            settings.db_prepare_threshold if settings.db_prepared_statements else None
+        ),
+    }
+
+
+def _create_engine(
+    url: str,
+    pool_size: int,
+    max_overflow: int,
+    statement_timeout_ms: int,
+    read_only: bool = False,
+):
+    """Create an async engine with the configured pool and timeouts"""
+    new_engine = create_async_engine(
+        url,
+        echo=settings.database_echo,  # Log SQL queries
+        json_serializer=dumps_str,  # Fast codec for JSON/JSONB columns
+        json_deserializer=loads,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_pre_ping=settings.db_pool_pre_ping,  # Extra round trip per checkout
+        pool_use_lifo=True,  # Reuse warm connections, let idle extras recycle
+        connect_args=_connect_args(statement_timeout_ms, read_only),
+    )
+
+    if settings.db_prepared_statements:
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _set_prepared_max(dbapi_connection, connection_record):
+            # Per-connection LRU of server-side prepared statements
+            dbapi_connection.driver_connection.prepared_max = (
+                settings.db_prepared_max
+            )
+
+    # Statement timings: spans in sampled requests, fingerprints and budgets
+    observers = [tracing.observe_statement]
+    if settings.query_stats_enabled:
+        observers.append(query_stats.query_stats.observe_statement)
+    instrument_engine(new_engine, observers)
+
+    return new_engine
+
+
+# Create async engine (webhook ingest, OAuth, writes)
+engine = _create_engine(
     settings.database_url,
-    echo=settings.environment == "development",  # Log SQL queries in dev
-    pool_pre_ping=True,  # Verify connections before use
-    pool_recycle=300,  # Recycle connections every 5 minutes
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    statement_timeout_ms=settings.db_statement_timeout_ms,
 )
 
-# Create async session factory
+# Read-only engine for analytics, on its own pool (and replica, if configured)
+# so heavy reads cannot exhaust primary connections
+read_engine = _create_engine(
+    settings.database_read_url or settings.database_url,
+    pool_size=settings.db_read_pool_size,
+    max_overflow=settings.db_read_max_overflow,
+    statement_timeout_ms=settings.db_read_statement_timeout_ms,
+    read_only=True,
+)
+
+# Create async session factories
 async_session_maker = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False,
 )
+read_session_maker = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
+
+# Engines whose connection pools are exported as metrics
+pooled_engines = {"primary": engine, "read": read_engine}
+
+
+def _pool_samples(stat: str):
+    """Read a pool statistic for each engine at scrape time"""
+    return [
+        ((name,), getattr(pooled_engine.pool, stat)())
+        for name, pooled_engine in pooled_engines.items()
+        if hasattr(pooled_engine.pool, stat)
+    ]
+
+
+for _stat, _description in (
+    ("size", "Configured pool size"),
+    ("checkedout", "Connections currently checked out"),
+    ("checkedin", "Idle connections in the pool"),
+    ("overflow", "Overflow connections in use (negative while below pool size)"),
+):
+    registry.callback_gauge(
+        f"db_pool_{_stat}",
+        _description,
+        ("engine",),
+        lambda _stat=_stat: _pool_samples(_stat),
+    )
 
 
 # Base model class
@@ -23,16 +130,79 @@ class Base(DeclarativeBase):
     pass
 
 
-# Dependency to get database session
+class LazySession:
+    """
+    AsyncSession proxy that creates the session on first use
+
+    Requests that never touch the database (rejected early, redirects) pay
+    nothing, and `release()` hands the connection back to the pool between
+    short database steps so it is not held across slow outbound calls.
+    Everything else is forwarded to the underlying AsyncSession.
+    """
+
+    def __init__(self, session_factory: Optional[async_sessionmaker] = None):
+        self._session_factory = session_factory or async_session_maker
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def started(self) -> bool:
+        """Whether the underlying session has been created"""
+        return self._session is not None
+
+    @property
+    def session(self) -> AsyncSession:
+        """The underlying AsyncSession, created on first access"""
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    def __getattr__(self, name: str):
+        return getattr(self.session, name)
+
+    async def release(self, commit: bool = False):
+        """
+        End the current transaction and return the connection to the pool
+
+        Loaded objects stay usable (detached); the session checks out a new
+        connection on its next query.
+
+        Args:
+            commit: Commit pending changes first (otherwise they are rolled back)
+        """
+        if self._session is None:
+            return
+        if commit:
+            await self._session.commit()
+        await self._session.close()
+
+    async def rollback(self):
+        if self._session is not None:
+            await self._session.rollback()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+# Dependency to get database session (created lazily on first use)
 async def get_db_session():
-    async with async_session_maker() as session:
-        try:
-            yield session
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
+    session = LazySession(async_session_maker)
+    try:
+        yield session
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+# Dependency to get a read-only session for analytics endpoints
+async def get_read_session():
+    session = LazySession(read_session_maker)
+    try:
+        yield session
+    finally:
+        await session.close()
 
 
 # Database utilities
@@ -1,19 +1,46 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Header, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from typing import Optional
 from fastapi.staticfiles import StaticFiles
 import logging
+from datetime import datetime
 from contextlib import asynccontextmanager
 
 from app.config import settings
 from app.database import create_tables
+from app.security import verify_admin_token
+from app.utils.last_seen import last_seen_tracker
+from app.utils.usage_writer import usage_writer
+from app.utils.statement_cache import warm_statement_cache
+from app.utils.maintenance import maintenance_sweeper
+from app.utils.json_codec import FastJSONResponse
+from app.utils.compression import CompressionMiddleware
+from app.utils.metrics import MetricsMiddleware, registry
+from app.utils.health import readiness_checker
+from app.utils.loop_monitor import loop_monitor
+from app.utils.log_config import configure_logging
+from app.utils.tracing import TracingMiddleware, tracer
+from app.utils.query_stats import QueryStatsMiddleware, query_stats
+from app.utils.profiler import (
+    PROFILE_FORMATS,
+    PROFILE_MODES,
+    profiler,
+    to_collapsed,
+    to_speedscope,
+)
 from app.routes.auth import router as auth_router
 from app.routes.webhooks import router as webhook_router
 from app.routes.shops import router as shops_router
+from app.routes.exports import router as exports_router
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Configure logging (formatting and I/O run on a background thread)
+configure_logging(
+    level=settings.log_level,
+    log_format=settings.log_format,
+    queue_size=settings.log_queue_size,
+    sample_limit=settings.log_sample_limit,
+    sample_window_seconds=settings.log_sample_window_seconds,
 )
 logger = logging.getLogger(__name__)
 
@@ -25,18 +52,38 @@ async def lifespan(app: FastAPI):
     """
     # Startup
     logger.info("Starting Shopify FastAPI App")
-    logger.info(f"Environment: {settings.environment}")
-    logger.info(f"App URL: {settings.app_url}")
+    logger.info("Environment: %s", settings.environment)
+    logger.info("App URL: %s", settings.app_url)
 
     # Create database tables (in production, use Alembic migrations)
     if settings.environment == "development":
         logger.info("Creating database tables...")
         await create_tables()
 
+    if settings.db_warm_statement_cache:
+        try:
+            await warm_statement_cache()
+        except Exception as e:
+            # Only a cold cache; requests compile statements on first use
+            logger.warning("Statement cache warmup failed: %s", e)
+
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
+
+    # Background writers
+    last_seen_tracker.start()
+    usage_writer.start()
+    if settings.maintenance_enabled:
+        maintenance_sweeper.start()
+
     yield
 
     # Shutdown
     logger.info("Shutting down Shopify FastAPI App")
+    await maintenance_sweeper.stop()
+    await usage_writer.stop()
+    await last_seen_tracker.stop()
+    await loop_monitor.stop()
 
 
 # Create FastAPI app
@@ -46,6 +93,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs" if settings.environment == "development" else None,
     redoc_url="/redoc" if settings.environment == "development" else None,
+    default_response_class=FastJSONResponse,
     lifespan=lifespan,
 )
 
@@ -58,6 +106,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Response compression
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+        zstd_level=settings.compression_zstd_level,
+        threadpool_min_size=settings.compression_threadpool_min_size,
+        excluded_paths=settings.compression_excluded_paths_list,
+    )
+
+# Per-request SQL statement counts and budgets
+if settings.query_stats_enabled:
+    app.add_middleware(QueryStatsMiddleware, collector=query_stats)
+
+# Request tracing (Server-Timing header, sampled)
+if settings.tracing_enabled:
+    app.add_middleware(
+        TracingMiddleware,
+        tracer=tracer,
+        excluded_paths=settings.tracing_excluded_paths_list,
+    )
+
+# Request metrics (outermost, so latency includes compression)
+app.add_middleware(MetricsMiddleware)
+
 
 # Custom exception handler
 @app.exception_handler(HTTPException)
@@ -65,8 +140,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     """
     Custom HTTP exception handler
     """
-    logger.warning(f"HTTP {exc.status_code}: {exc.detail} - {request.url}")
-    return JSONResponse(
+    logger.warning("HTTP %s: %s - %s", exc.status_code, exc.detail, request.url)
+    return FastJSONResponse(
         status_code=exc.status_code,
         content={
             "error": exc.detail,
@@ -81,8 +156,8 @@ async def general_exception_handler(request: Request, exc: Exception):
     """
     Handle unexpected exceptions
     """
-    logger.error(f"Unexpected error: {exc} - {request.url}", exc_info=True)
-    return JSONResponse(
+    logger.error("Unexpected error: %s - %s", exc, request.url, exc_info=True)
+    return FastJSONResponse(
         status_code=500,
         content={
             "error": "Internal server error",
@@ -96,6 +171,7 @@ async def general_exception_handler(request: Request, exc: Exception):
 app.include_router(auth_router)
 app.include_router(webhook_router)
 app.include_router(shops_router)
+app.include_router(exports_router)
 
 
 # Root endpoints
@@ -138,10 +214,86 @@ async def health_check():
     return {
         "status": "healthy",
         "environment": settings.environment,
-        "timestamp": "2025-01-17T12:00:00Z",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
     }
 
 
+@app.get("/health/live")
+async def liveness_check():
+    """
+    Liveness probe: the process is up and the event loop is responding
+    """
+    return {"status": "alive", "timestamp": datetime.utcnow().isoformat() + "Z"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness probe: database, pool, event loop and webhook backlog checks
+
+    Returns 503 when any check fails so the load balancer stops routing
+    traffic to this worker.
+    """
+    result = await readiness_checker.check()
+    return FastJSONResponse(
+        status_code=200 if result["status"] == "ready" else 503,
+        content=result,
+        headers={"Cache-Control": "no-store"},
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics endpoint
+    """
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/admin/profile", include_in_schema=False)
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0),
+    mode: str = Query("cpu", description="'cpu' or 'await'"),
+    output_format: str = Query(
+        "collapsed", alias="format", description="'collapsed' or 'speedscope'"
+    ),
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Profile the worker that receives this request for N seconds
+
+    'cpu' samples the event loop thread's stack; 'await' samples the await
+    chains of suspended tasks. Requires profiler_enabled and an access token
+    with role=admin.
+    """
+    if not settings.profiler_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    verify_admin_token(authorization)
+
+    if mode not in PROFILE_MODES or output_format not in PROFILE_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"mode must be one of {PROFILE_MODES}, "
+            f"format one of {PROFILE_FORMATS}",
+        )
+    if profiler.running:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running in this worker",
+        )
+
+    seconds = min(seconds, settings.profiler_max_seconds)
+    interval = settings.profiler_sample_interval_seconds
+    stacks = await profiler.profile(seconds, interval, mode)
+
+    if output_format == "speedscope":
+        return to_speedscope(stacks, f"{mode} profile", interval, seconds)
+    return PlainTextResponse(to_collapsed(stacks))
+
+
 @app.get("/dashboard", response_class=HTMLResponse)
 async def admin_dashboard():
     """
@@ -152,6 +152,7 @@
 #         return f"<WebhookEvent(shop='{self.shop_domain}', topic='{self.topic}', processed={self.processed})>"
 from sqlalchemy import (
     Column,
+    BigInteger,
     Integer,
     String,
     Text,
@@ -159,9 +160,11 @@ from sqlalchemy import (
     DateTime,
     JSON,
     ForeignKey,
+    Index,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from datetime import datetime
 from app.database import Base
 
@@ -207,7 +210,8 @@ class Shop(Base):
     uninstalled_at = Column(DateTime, nullable=True)
 
     # App-specific data
-    app_settings = Column(JSON, nullable=True, default={})
+    app_settings = Column(JSONB, nullable=True, default={})
+    settings_version = Column(Integer, default=0, server_default="0", nullable=False)
     subscription_status = Column(String(20), default="trial", nullable=False)
 
     # Timestamps
@@ -248,6 +252,8 @@ class ShopUsage(Base):
     """Track API usage and metrics per shop"""
 
     __tablename__ = "shop_usage"
+    # Per-shop max(id) for the detail view's version check
+    __table_args__ = (Index("ix_shop_usage_shop_domain_id", "shop_domain", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     shop_domain = Column(String(255), ForeignKey("shops.shop_domain"), nullable=False)
@@ -274,6 +280,19 @@ class WebhookEvent(Base):
     """Track webhook events from Shopify"""
 
     __tablename__ = "webhook_events"
+    __table_args__ = (
+        # Per-shop max(id) for the detail view's version check
+        Index("ix_webhook_events_shop_domain_id", "shop_domain", "id"),
+        # Pending events only: readiness backlog count and the stale sweep
+        Index(
+            "ix_webhook_events_unprocessed",
+            "received_at",
+            postgresql_where=text("processed = false AND error_message IS NULL"),
+        ),
+        # Shopify's X-Shopify-Webhook-Id: redeliveries and re-imports are
+        # stored once
+        Index("ix_webhook_events_webhook_id", "webhook_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     shop_domain = Column(String(255), ForeignKey("shops.shop_domain"), nullable=False)
@@ -292,9 +311,25 @@ class WebhookEvent(Base):
     processed = Column(Boolean, default=False, nullable=False)
     processed_at = Column(DateTime, nullable=True)
     error_message = Column(Text, nullable=True)
+    requeued_at = Column(DateTime, nullable=True)  # Claimed by the sweeper
 
     # Timestamps
     received_at = Column(DateTime, server_default=func.now(), nullable=False)
 
     def __repr__(self):
         return f"<WebhookEvent(shop='{self.shop_domain}', topic='{self.topic}', processed={self.processed})>"
+
+
+class BulkImportCheckpoint(Base):
+    """Progress of a bulk import (app.bulk_import), committed with each batch"""
+
+    __tablename__ = "bulk_import_checkpoints"
+
+    source = Column(String(1024), primary_key=True)  # Input file or import name
+    table_name = Column(String(100), primary_key=True)
+    records = Column(BigInteger, default=0, nullable=False)  # Input records done
+    merged = Column(BigInteger, default=0, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<BulkImportCheckpoint(source='{self.source}', records={self.records})>"
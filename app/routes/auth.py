@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, Request, HTTPException, status
 from fastapi.responses import RedirectResponse, HTMLResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, or_
 from urllib.parse import urlencode
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 
 from app.database import get_db_session
@@ -11,10 +11,13 @@ from app.models import Shop, OAuthState
 from app.security import is_valid_shop_domain, verify_oauth_hmac
 from app.utils.oauth import (
     generate_state,
+    create_signed_state,
+    verify_signed_state,
     build_oauth_authorize_url,
     build_redirect_uri,
 )
 from app.utils.shopify_api import exchange_code_for_token, ShopifyAPI
+from app.utils.credentials_cache import shop_credentials_cache
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -35,15 +38,24 @@ async def install_app(shop: str, session: AsyncSession = Depends(get_db_session)
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid shop domain format"
         )
 
-    # Generate secure state for OAuth
-    state = generate_state()
-
-    # Store state in database for verification
-    oauth_state = OAuthState(state=state, shop_domain=shop)
-    session.add(oauth_state)
-    await session.commit()
+    if settings.oauth_state_mode == "signed":
+        # Stateless signed state, verified on callback without the database
+        state = create_signed_state(shop)
+    else:
+        # Generate secure state for OAuth
+        state = generate_state()
+
+        # Store state in database for verification
+        oauth_state = OAuthState(
+            state=state,
+            shop_domain=shop,
+            expires_at=datetime.utcnow()
+            + timedelta(seconds=settings.oauth_state_ttl_seconds),
+        )
+        session.add(oauth_state)
+        await session.commit()
 
-    logger.info(f"Starting OAuth flow for shop: {shop}")
+    logger.info("Starting OAuth flow for shop: %s", shop, extra={"shop": shop})
 
     # Build OAuth authorization URL
     redirect_uri = build_redirect_uri("/auth/callback")
@@ -80,28 +92,41 @@ async def oauth_callback(
 
     # Verify HMAC signature
     if not verify_oauth_hmac(query_params):
-        logger.warning(f"Invalid HMAC for shop: {shop_domain}")
+        logger.warning("Invalid HMAC for shop: %s", shop_domain)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid HMAC signature"
         )
 
     # Verify and consume OAuth state
-    result = await session.execute(
-        select(OAuthState).where(
-            OAuthState.state == state, OAuthState.shop_domain == shop_domain
-        )
-    )
-    oauth_state_record = result.scalar_one_or_none()
-
-    if not oauth_state_record:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired OAuth state",
+    if settings.oauth_state_mode == "signed":
+        if not verify_signed_state(state, shop_domain):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired OAuth state",
+            )
+    else:
+        # Consume the state (one-time use) in a single short transaction;
+        # the commit returns the connection before the Shopify calls below
+        result = await session.execute(
+            delete(OAuthState)
+            .where(
+                OAuthState.state == state,
+                OAuthState.shop_domain == shop_domain,
+                or_(
+                    OAuthState.expires_at.is_(None),
+                    OAuthState.expires_at > datetime.utcnow(),
+                ),
+            )
+            .returning(OAuthState.id)
         )
+        oauth_state_record = result.scalar_one_or_none()
+        await session.commit()
 
-    # Delete used state (one-time use)
-    await session.execute(delete(OAuthState).where(OAuthState.state == state))
-    await session.commit()
+        if not oauth_state_record:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired OAuth state",
+            )
 
     try:
         # Exchange code for access token
@@ -120,7 +145,7 @@ async def oauth_callback(
         shop_info_response = await shop_api.get_shop_info()
         shop_info = shop_info_response.get("shop", {})
 
-        # Create or update shop record
+        # Create or update shop record (short write transaction)
         result = await session.execute(
             select(Shop).where(Shop.shop_domain == shop_domain)
         )
@@ -138,7 +163,7 @@ async def oauth_callback(
             shop_record.updated_at = now
             # Update shop info
             update_shop_info(shop_record, shop_info)
-            logger.info(f"Updated shop record for: {shop_domain}")
+            logger.debug("Updated shop record for: %s", shop_domain)
         else:
             # Create new shop record
             shop_record = Shop(
@@ -151,14 +176,19 @@ async def oauth_callback(
             )
             update_shop_info(shop_record, shop_info)
             session.add(shop_record)
-            logger.info(f"Created new shop record for: {shop_domain}")
+            logger.debug("Created new shop record for: %s", shop_domain)
 
         await session.commit()
+        shop_credentials_cache.invalidate(shop_domain)
 
         # Log successful installation
-        logger.info(f"Successfully installed app for shop: {shop_domain}")
-        logger.info(f"Shop name: {shop_info.get('name', 'Unknown')}")
-        logger.info(f"Plan: {shop_info.get('plan_display_name', 'Unknown')}")
+        logger.info(
+            "Successfully installed app for shop: %s (%s, plan: %s)",
+            shop_domain,
+            shop_info.get("name", "Unknown"),
+            shop_info.get("plan_display_name", "Unknown"),
+            extra={"shop": shop_domain},
+        )
 
         # Redirect to success page
         params = urlencode({"shop": shop_domain})
@@ -167,7 +197,7 @@ async def oauth_callback(
         )
 
     except Exception as e:
-        logger.error(f"OAuth callback error for shop {shop_domain}: {e}")
+        logger.error("OAuth callback error for shop %s: %s", shop_domain, e)
         await session.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -187,11 +217,18 @@ async def installation_success(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid shop domain"
         )
 
-    # Verify shop is installed
+    # Verify shop is installed (only the columns shown on the page)
     result = await session.execute(
-        select(Shop).where(Shop.shop_domain == shop, Shop.uninstalled == False)
+        select(
+            Shop.shop_name,
+            Shop.plan_display_name,
+            Shop.country_name,
+            Shop.country_code,
+            Shop.scopes,
+            Shop.installed_at,
+        ).where(Shop.shop_domain == shop, Shop.uninstalled == False)
     )
-    shop_record = result.scalar_one_or_none()
+    shop_record = result.one_or_none()
 
     if not shop_record:
         return HTMLResponse(
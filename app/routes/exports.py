@@ -0,0 +1,229 @@
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+from starlette.background import BackgroundTask
+from typing import Optional
+from datetime import datetime
+import logging
+
+from app.config import settings
+from app.database import read_engine
+from app.models import Shop, ShopUsage, WebhookEvent
+from app.security import verify_admin_token
+from app.utils.pg_copy import stream_copy_out
+from app.utils.shop_queries import apply_shop_filters
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api/admin/export", tags=["exports"])
+
+# Exported shop columns (never the access token)
+SHOP_EXPORT_COLUMNS = (
+    Shop.id,
+    Shop.shop_domain,
+    Shop.myshopify_domain,
+    Shop.scopes,
+    Shop.shop_name,
+    Shop.shop_email,
+    Shop.shop_owner,
+    Shop.country_code,
+    Shop.country_name,
+    Shop.currency,
+    Shop.timezone,
+    Shop.primary_locale,
+    Shop.plan_name,
+    Shop.plan_display_name,
+    Shop.primary_domain,
+    Shop.installed_at,
+    Shop.last_seen_at,
+    Shop.uninstalled,
+    Shop.uninstalled_at,
+    Shop.subscription_status,
+    Shop.app_settings,
+    Shop.created_at,
+    Shop.updated_at,
+)
+
+USAGE_EXPORT_COLUMNS = (
+    ShopUsage.id,
+    ShopUsage.shop_domain,
+    ShopUsage.metric_name,
+    ShopUsage.metric_value,
+    ShopUsage.metric_data,
+    ShopUsage.date,
+    ShopUsage.created_at,
+)
+
+# Webhook headers are left out (they carry the HMAC)
+WEBHOOK_EVENT_EXPORT_COLUMNS = (
+    WebhookEvent.id,
+    WebhookEvent.shop_domain,
+    WebhookEvent.topic,
+    WebhookEvent.webhook_id,
+    WebhookEvent.processed,
+    WebhookEvent.processed_at,
+    WebhookEvent.error_message,
+    WebhookEvent.received_at,
+)
+
+
+class ExportSlots:
+    """Non-blocking limit on concurrent exports in this worker"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.running = 0
+
+    def try_acquire(self) -> bool:
+        if self.running >= self.limit:
+            return False
+        self.running += 1
+        return True
+
+    def release(self):
+        self.running -= 1
+
+
+# Each running export holds a read connection for its whole duration
+_export_slots = ExportSlots(settings.export_max_concurrent)
+
+
+def _apply_time_range(
+    query: Select, column, since: Optional[datetime], until: Optional[datetime]
+) -> Select:
+    """Limit a query to since <= column < until"""
+    if since is not None:
+        query = query.where(column >= since)
+    if until is not None:
+        query = query.where(column < until)
+    return query
+
+
+def _csv_response(
+    name: str, query: Select, authorization: Optional[str]
+) -> StreamingResponse:
+    """
+    Stream a query as a CSV download
+
+    Raises:
+        HTTPException: If the token is not an admin token, or too many exports
+            are running in this worker
+    """
+    verify_admin_token(authorization)
+
+    # Taken before the response starts, so excess requests get 429 at once
+    if not _export_slots.try_acquire():
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many exports running, try again later",
+        )
+
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            _export_slots.release()
+
+    async def stream():
+        chunks = stream_copy_out(
+            read_engine,
+            query,
+            chunk_size=settings.export_chunk_size,
+            statement_timeout_ms=settings.export_statement_timeout_ms,
+        )
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+            release()
+        logger.info("Export of %s finished", name)
+
+    filename = f"{name}-{datetime.utcnow():%Y%m%dT%H%M%SZ}.csv"
+    return StreamingResponse(
+        stream(),
+        media_type="text/csv; charset=utf-8",
+        # Also releases the slot if the client left before streaming started
+        background=BackgroundTask(release),
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@router.get("/shops")
+async def export_shops(
+    shop: Optional[str] = Query(None, description="Only this shop domain"),
+    status: Optional[str] = Query(
+        "all", description="Filter by status (active/uninstalled/all)"
+    ),
+    country: Optional[str] = Query(None, description="Filter by country code"),
+    plan: Optional[str] = Query(None, description="Filter by plan name"),
+    since: Optional[datetime] = Query(None, description="Installed at or after"),
+    until: Optional[datetime] = Query(None, description="Installed before"),
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Export shops as CSV (admin token required)
+
+    Streams `COPY ... TO STDOUT` output from the read database, so memory
+    use does not grow with the number of shops.
+    """
+    query = apply_shop_filters(select(*SHOP_EXPORT_COLUMNS), status, country, plan)
+    if shop:
+        query = query.where(Shop.shop_domain == shop)
+    query = _apply_time_range(query, Shop.installed_at, since, until)
+    return _csv_response("shops", query.order_by(Shop.id), authorization)
+
+
+@router.get("/usage")
+async def export_usage(
+    shop: Optional[str] = Query(None, description="Only this shop domain"),
+    metric: Optional[str] = Query(None, description="Filter by metric name"),
+    since: Optional[datetime] = Query(None, description="Usage at or after"),
+    until: Optional[datetime] = Query(None, description="Usage before"),
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Export usage records as CSV (admin token required)
+    """
+    query = select(*USAGE_EXPORT_COLUMNS)
+    if shop:
+        query = query.where(ShopUsage.shop_domain == shop)
+    if metric:
+        query = query.where(ShopUsage.metric_name == metric)
+    query = _apply_time_range(query, ShopUsage.date, since, until)
+    return _csv_response("usage", query.order_by(ShopUsage.id), authorization)
+
+
+@router.get("/webhook-events")
+async def export_webhook_events(
+    shop: Optional[str] = Query(None, description="Only this shop domain"),
+    topic: Optional[str] = Query(None, description="Filter by topic"),
+    processed: Optional[bool] = Query(None, description="Filter by processed"),
+    since: Optional[datetime] = Query(None, description="Received at or after"),
+    until: Optional[datetime] = Query(None, description="Received before"),
+    include_payload: bool = Query(True, description="Include the JSON payload"),
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Export webhook events as CSV (admin token required)
+    """
+    columns = WEBHOOK_EVENT_EXPORT_COLUMNS
+    if include_payload:
+        columns += (WebhookEvent.payload,)
+
+    query = select(*columns)
+    if shop:
+        query = query.where(WebhookEvent.shop_domain == shop)
+    if topic:
+        query = query.where(WebhookEvent.topic == topic)
+    if processed is not None:
+        query = query.where(WebhookEvent.processed == processed)
+    query = _apply_time_range(query, WebhookEvent.received_at, since, until)
+    return _csv_response(
+        "webhook-events", query.order_by(WebhookEvent.id), authorization
+    )
@@ -435,17 +435,44 @@
 #     }
 
 
-from fastapi import APIRouter, Depends, HTTPException, status, Header, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query, Request
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, desc
+from sqlalchemy import select, func, and_
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import logging
 
-from app.database import get_db_session
+from app.database import get_db_session, get_read_session
 from app.models import Shop, ShopUsage, WebhookEvent
-from app.security import is_valid_shop_domain, verify_session_token
+from app.security import (
+    is_valid_shop_domain,
+    verify_admin_token,
+    verify_session_token,
+)
 from app.utils.shopify_api import ShopifyAPI
+from app.utils.last_seen import last_seen_tracker
+from app.utils.credentials_cache import shop_credentials_cache
+from app.utils.usage_writer import usage_writer
+from app.utils.json_codec import FastJSONResponse
+from app.utils.maintenance import maintenance_sweeper
+from app.utils.tracing import trace_buffer, tracer
+from app.utils.query_stats import query_stats
+from app.utils.shop_queries import (
+    serialize_shop_row,
+    settings_update_statement,
+    shop_count_query,
+    shop_credentials_query,
+    shop_detail_query,
+    shop_list_query,
+    shop_version_query,
+)
+from app.utils.etag import (
+    json_response_with_etag,
+    not_modified_response,
+    raw_json_response_with_etag,
+    version_etag,
+)
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -462,82 +489,42 @@ async def list_all_shops(
     ),
     limit: int = Query(50, le=100, description="Maximum number of shops to return"),
     offset: int = Query(0, ge=0, description="Number of shops to skip"),
-    session: AsyncSession = Depends(get_db_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
     List all shops (admin endpoint)
     """
-    query = select(Shop)
-
-    # Apply filters
-    if status == "active":
-        query = query.where(Shop.uninstalled == False)
-    elif status == "uninstalled":
-        query = query.where(Shop.uninstalled == True)
-    # For "all", don't filter by uninstalled status
-
-    if country:
-        query = query.where(Shop.country_code == country.upper())
-    if plan:
-        query = query.where(Shop.plan_name == plan.lower())
-
-    # Apply pagination
-    query = query.order_by(desc(Shop.installed_at)).offset(offset).limit(limit)
-
+    # Slim projection: plain rows instead of identity-mapped Shop entities
+    query = shop_list_query(status, country, plan).offset(offset).limit(limit)
     result = await session.execute(query)
-    shops = result.scalars().all()
+    shops = result.all()
 
     # Get total count
-    count_query = select(func.count(Shop.id))
-    if status == "active":
-        count_query = count_query.where(Shop.uninstalled == False)
-    elif status == "uninstalled":
-        count_query = count_query.where(Shop.uninstalled == True)
-    if country:
-        count_query = count_query.where(Shop.country_code == country.upper())
-    if plan:
-        count_query = count_query.where(Shop.plan_name == plan.lower())
-
-    total = await session.scalar(count_query)
-
-    return {
-        "shops": [
-            {
-                "id": shop.id,
-                "shop_domain": shop.shop_domain,
-                "shop_name": shop.shop_name,
-                "country": shop.country_code,
-                "country_name": shop.country_name,
-                "currency": shop.currency,
-                "plan": {
-                    "name": shop.plan_name,
-                    "display_name": shop.plan_display_name,
-                },
-                "status": "uninstalled" if shop.uninstalled else "active",
-                "installed_at": shop.installed_at,
-                "last_seen_at": shop.last_seen_at,
-                "uninstalled_at": shop.uninstalled_at,
-                "subscription_status": shop.subscription_status,
-                "scopes": shop.scopes.split(",") if shop.scopes else [],
-            }
-            for shop in shops
-        ],
-        "pagination": {
-            "total": total,
-            "limit": limit,
-            "offset": offset,
-            "has_next": offset + limit < total,
-        },
-    }
+    total = await session.scalar(shop_count_query(status, country, plan))
+
+    return FastJSONResponse(
+        {
+            "shops": [serialize_shop_row(shop) for shop in shops],
+            "pagination": {
+                "total": total,
+                "limit": limit,
+                "offset": offset,
+                "has_next": offset + limit < total,
+            },
+        }
+    )
 
 
 @router.get("/admin/stats")
 async def get_platform_stats(
+    request: Request,
     days: int = Query(30, le=365, description="Number of days to include in stats"),
-    session: AsyncSession = Depends(get_db_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
     Get platform-wide statistics
+
+    Supports If-None-Match with an ETag over everything but generated_at.
     """
     since = datetime.utcnow() - timedelta(days=days)
 
@@ -581,39 +568,138 @@ async def get_platform_stats(
         select(func.count(WebhookEvent.id)).where(WebhookEvent.received_at >= since)
     )
 
-    return {
-        "overview": {
-            "total_shops": total_shops,
-            "active_shops": active_shops,
-            "uninstalled_shops": total_shops - active_shops,
-        },
-        "recent_activity": {
-            "period_days": days,
-            "new_installs": recent_installs,
-            "uninstalls": recent_uninstalls,
-            "webhook_events": webhook_count,
-        },
-        "distribution": {
-            "by_country": dict(country_result.fetchall()),
-            "by_plan": dict(plan_result.fetchall()),
+    return json_response_with_etag(
+        request,
+        {
+            "overview": {
+                "total_shops": total_shops,
+                "active_shops": active_shops,
+                "uninstalled_shops": total_shops - active_shops,
+            },
+            "recent_activity": {
+                "period_days": days,
+                "new_installs": recent_installs,
+                "uninstalls": recent_uninstalls,
+                "webhook_events": webhook_count,
+            },
+            "distribution": {
+                "by_country": dict(country_result.fetchall()),
+                "by_plan": dict(plan_result.fetchall()),
+            },
+            "generated_at": datetime.utcnow(),
         },
-        "generated_at": datetime.utcnow(),
+        volatile_keys=("generated_at",),
+    )
+
+
+@router.get("/admin/maintenance")
+async def get_maintenance_stats():
+    """
+    Get counters from the background maintenance sweeper
+    """
+    return {
+        "enabled": settings.maintenance_enabled,
+        "interval_seconds": maintenance_sweeper.interval_seconds,
+        "stats": maintenance_sweeper.stats,
+    }
+
+
+@router.get("/admin/queries")
+async def get_query_stats(
+    limit: int = Query(20, ge=1, le=200),
+    order_by: str = Query("total_ms", pattern="^(total_ms|count|mean_ms|max_ms)$"),
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Get the top SQL statement fingerprints and recent budget violations
+    (admin token required)
+    """
+    verify_admin_token(authorization)
+    return {
+        "enabled": settings.query_stats_enabled,
+        "default_budget": query_stats.default_budget,
+        "fingerprints": query_stats.top(limit, order_by),
+        "flagged_requests": list(query_stats.flagged)[::-1],
     }
 
 
+@router.delete("/admin/queries")
+async def reset_query_stats(authorization: Optional[str] = Header(None)):
+    """
+    Clear collected SQL statement statistics (admin token required)
+    """
+    verify_admin_token(authorization)
+    query_stats.reset()
+    return {"status": "success"}
+
+
+@router.get("/admin/traces")
+async def list_recent_traces(
+    limit: int = Query(50, ge=1, le=500),
+    min_duration_ms: float = Query(0.0, ge=0),
+    authorization: Optional[str] = Header(None),
+):
+    """
+    List recently sampled request traces (admin token required, newest first)
+
+    Spans carry request paths, SQL text and shop attributes.
+    """
+    verify_admin_token(authorization)
+    return {
+        "enabled": settings.tracing_enabled,
+        "sample_rate": tracer.sample_rate,
+        "traces": trace_buffer.recent(limit, min_duration_ms),
+    }
+
+
+@router.get("/admin/traces/{trace_id}")
+async def get_trace(trace_id: str, authorization: Optional[str] = Header(None)):
+    """
+    Get all spans of a sampled request trace (admin token required)
+    """
+    verify_admin_token(authorization)
+    trace = trace_buffer.get(trace_id)
+    if trace is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Trace not found"
+        )
+    return trace
+
+
 @router.get("/shops/{shop_domain}")
 async def get_shop_details(
-    shop_domain: str, session: AsyncSession = Depends(get_db_session)
+    shop_domain: str,
+    request: Request,
+    session: AsyncSession = Depends(get_db_session),
 ):
     """
     Get detailed information about a specific shop
+
+    Supports If-None-Match: the ETag is derived from version markers, so an
+    unchanged shop gets a 304 before any of the detail queries run.
     """
     if not is_valid_shop_domain(shop_domain):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid shop domain format"
         )
 
-    result = await session.execute(select(Shop).where(Shop.shop_domain == shop_domain))
+    # The 7-day window moves in whole minutes so it can be part of the ETag
+    week_ago = datetime.utcnow().replace(second=0, microsecond=0) - timedelta(days=7)
+
+    version = (await session.execute(shop_version_query(shop_domain))).one_or_none()
+    if not version:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Shop not found"
+        )
+
+    etag = version_etag(*version, week_ago)
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    result = await session.execute(
+        shop_detail_query().where(Shop.shop_domain == shop_domain)
+    )
     shop = result.scalar_one_or_none()
 
     if not shop:
@@ -622,7 +708,6 @@ async def get_shop_details(
         )
 
     # Get recent usage data
-    week_ago = datetime.utcnow() - timedelta(days=7)
     usage_result = await session.execute(
         select(ShopUsage.metric_name, func.sum(ShopUsage.metric_value))
         .where(and_(ShopUsage.shop_domain == shop_domain, ShopUsage.date >= week_ago))
@@ -643,47 +728,63 @@ async def get_shop_details(
     )
     webhook_stats = dict(recent_webhooks.fetchall())
 
-    return {
-        "shop": {
-            "domain": shop.shop_domain,
-            "name": shop.shop_name,
-            "email": shop.shop_email,
-            "owner": shop.shop_owner,
-            "location": {
-                "country_code": shop.country_code,
-                "country_name": shop.country_name,
-                "timezone": shop.timezone,
-                "primary_locale": shop.primary_locale,
+    return FastJSONResponse(
+        {
+            "shop": {
+                "domain": shop.shop_domain,
+                "name": shop.shop_name,
+                "email": shop.shop_email,
+                "owner": shop.shop_owner,
+                "location": {
+                    "country_code": shop.country_code,
+                    "country_name": shop.country_name,
+                    "timezone": shop.timezone,
+                    "primary_locale": shop.primary_locale,
+                },
+                "plan": {
+                    "name": shop.plan_name,
+                    "display_name": shop.plan_display_name,
+                },
+                "domains": {
+                    "myshopify": shop.myshopify_domain,
+                    "primary": shop.primary_domain,
+                },
+                "currency": shop.currency,
+                "status": "uninstalled" if shop.uninstalled else "active",
+                "subscription_status": shop.subscription_status,
             },
-            "plan": {"name": shop.plan_name, "display_name": shop.plan_display_name},
-            "domains": {
-                "myshopify": shop.myshopify_domain,
-                "primary": shop.primary_domain,
+            "installation": {
+                "installed_at": shop.installed_at,
+                "last_seen_at": shop.last_seen_at,
+                "uninstalled_at": shop.uninstalled_at,
+                "scopes": shop.scopes.split(",") if shop.scopes else [],
             },
-            "currency": shop.currency,
-            "status": "uninstalled" if shop.uninstalled else "active",
-            "subscription_status": shop.subscription_status,
+            "settings": shop.app_settings or {},
+            "settings_version": shop.settings_version,
+            "usage_stats": usage_stats,
+            "webhook_stats": webhook_stats,
         },
-        "installation": {
-            "installed_at": shop.installed_at,
-            "last_seen_at": shop.last_seen_at,
-            "uninstalled_at": shop.uninstalled_at,
-            "scopes": shop.scopes.split(",") if shop.scopes else [],
-        },
-        "settings": shop.app_settings or {},
-        "usage_stats": usage_stats,
-        "webhook_stats": webhook_stats,
-    }
+        headers={"ETag": etag},
+    )
 
 
 @router.put("/shops/{shop_domain}/settings")
 async def update_shop_settings(
     shop_domain: str,
     settings_data: Dict[str, Any],
+    deep_merge: bool = Query(
+        False, description="Merge nested setting objects instead of replacing them"
+    ),
+    expected_version: Optional[int] = Query(
+        None, description="Only apply if the stored settings version matches"
+    ),
     session: AsyncSession = Depends(get_db_session),
 ):
     """
     Update app settings for a specific shop
+
+    The merge happens atomically in the database, so concurrent writers
+    never overwrite each other's keys.
     """
     if not is_valid_shop_domain(shop_domain):
         raise HTTPException(
@@ -691,31 +792,44 @@ async def update_shop_settings(
         )
 
     result = await session.execute(
-        select(Shop).where(Shop.shop_domain == shop_domain, Shop.uninstalled == False)
+        settings_update_statement(
+            shop_domain, settings_data, deep_merge, expected_version
+        )
     )
-    shop = result.scalar_one_or_none()
+    updated = result.one_or_none()
+
+    if not updated:
+        await session.rollback()
+
+        # Distinguish a version conflict from a missing shop (failure path only)
+        if expected_version is not None:
+            current_version = await session.scalar(
+                select(Shop.settings_version).where(
+                    Shop.shop_domain == shop_domain, Shop.uninstalled == False
+                )
+            )
+            if current_version is not None:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Settings version mismatch (current: {current_version})",
+                )
 
-    if not shop:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Shop not found or uninstalled",
         )
 
-    # Update settings
-    current_settings = shop.app_settings or {}
-    current_settings.update(settings_data)
-    shop.app_settings = current_settings
-    shop.last_seen_at = datetime.utcnow()
-    shop.updated_at = datetime.utcnow()
-
     await session.commit()
 
-    logger.info(f"Updated settings for shop: {shop_domain}")
+    logger.info(
+        "Updated settings for shop: %s", shop_domain, extra={"shop": shop_domain}
+    )
 
     return {
         "status": "success",
         "shop_domain": shop_domain,
-        "settings": shop.app_settings,
+        "settings": updated.app_settings,
+        "settings_version": updated.settings_version,
     }
 
 
@@ -724,7 +838,6 @@ async def update_shop_settings(
 async def test_get_products(
     shop: str = Query(..., description="Shop domain"),
     limit: int = Query(10, le=100, description="Number of products"),
-    session: AsyncSession = Depends(get_db_session),
 ):
     """
     Test endpoint to get products without session token (for development)
@@ -734,11 +847,8 @@ async def test_get_products(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid shop domain"
         )
 
-    # Get shop record
-    result = await session.execute(
-        select(Shop).where(Shop.shop_domain == shop, Shop.uninstalled == False)
-    )
-    shop_record = result.scalar_one_or_none()
+    # Get shop credentials (cached; no connection held past the read)
+    shop_record = await shop_credentials_cache.get(shop)
 
     if not shop_record:
         raise HTTPException(
@@ -755,23 +865,21 @@ async def test_get_products(
     # Fetch products from Shopify
     try:
         shopify_api = ShopifyAPI(shop, shop_record.access_token)
-        products_data = await shopify_api.get_products_graphql(limit)
-
-        # Track usage
-        usage_record = ShopUsage(
-            shop_domain=shop,
-            metric_name="api_calls",
-            metric_value=1,
-            metric_data={"endpoint": "products_test", "limit": limit},
+        # Raw passthrough: Shopify's JSON body is returned as-is
+        products_data = await shopify_api.get_products_graphql_raw(limit)
+
+        # Track usage (batched write-behind)
+        usage_writer.record(
+            shop, "api_calls", 1, {"endpoint": "products_test", "limit": limit}
         )
-        session.add(usage_record)
-        await session.commit()
 
-        logger.info(f"Successfully fetched {limit} products for {shop}")
-        return products_data
+        logger.info(
+            "Successfully fetched %d products for %s", limit, shop, extra={"shop": shop}
+        )
+        return Response(content=products_data, media_type="application/json")
 
     except Exception as e:
-        logger.error(f"Error fetching products for {shop}: {e}")
+        logger.error("Error fetching products for %s: %s", shop, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch products: {str(e)}",
@@ -845,24 +953,22 @@ async def test_get_products(
 
 @router.get("/products")
 async def get_shop_products(
+    request: Request,
     shop: str = Query(..., description="Shop domain"),
     limit: int = Query(50, le=100, description="Number of products to return"),
-    session: AsyncSession = Depends(get_db_session),
 ):
     """
     Get products for a shop using stored access token
     This is the standard way for server-to-server API calls.
+    Supports If-None-Match with a content-hash ETag.
     """
     if not is_valid_shop_domain(shop):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid shop domain"
         )
 
-    # Get shop record with access token
-    result = await session.execute(
-        select(Shop).where(Shop.shop_domain == shop, Shop.uninstalled == False)
-    )
-    shop_record = result.scalar_one_or_none()
+    # Get shop credentials (cached; no connection held past the read)
+    shop_record = await shop_credentials_cache.get(shop)
 
     if not shop_record:
         raise HTTPException(
@@ -879,27 +985,27 @@ async def get_shop_products(
     # Use the stored access token to fetch products
     try:
         shopify_api = ShopifyAPI(shop, shop_record.access_token)
-        products_data = await shopify_api.get_products_graphql(limit)
-
-        # Track API usage
-        usage_record = ShopUsage(
-            shop_domain=shop,
-            metric_name="api_calls",
-            metric_value=1,
-            metric_data={"endpoint": "products", "limit": limit},
+        # Raw passthrough: Shopify's JSON body is returned as-is
+        products_data = await shopify_api.get_products_graphql_raw(limit)
+
+        # Track usage (batched write-behind)
+        usage_writer.record(
+            shop, "api_calls", 1, {"endpoint": "products", "limit": limit}
         )
-        session.add(usage_record)
-        await session.commit()
 
-        # Update last seen
-        shop_record.last_seen_at = datetime.utcnow()
-        await session.commit()
+        # Update last seen (batched write-behind)
+        last_seen_tracker.touch(shop)
 
-        logger.info(f"Successfully fetched {limit} products for {shop}")
-        return products_data
+        logger.info(
+            "Successfully fetched %d products for %s", limit, shop, extra={"shop": shop}
+        )
+        # extensions.cost (throttle status) changes on every call
+        return raw_json_response_with_etag(
+            request, products_data, volatile_keys=("extensions",)
+        )
 
     except Exception as e:
-        logger.error(f"Error fetching products for {shop}: {e}")
+        logger.error("Error fetching products for %s: %s", shop, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch products: {str(e)}",
@@ -912,7 +1018,6 @@ async def get_shop_products_embedded(
     shop: str = Query(..., description="Shop domain"),
     limit: int = Query(50, le=100, description="Number of products to return"),
     authorization: Optional[str] = Header(None),
-    session: AsyncSession = Depends(get_db_session),
 ):
     """
     Get products for embedded apps (requires session token)
@@ -935,11 +1040,8 @@ async def get_shop_products_embedded(
     # Verify session token (this checks the JWT from Shopify)
     verify_session_token(token, shop)
 
-    # Get shop record
-    result = await session.execute(
-        select(Shop).where(Shop.shop_domain == shop, Shop.uninstalled == False)
-    )
-    shop_record = result.scalar_one_or_none()
+    # Get shop credentials (cached; no connection held past the read)
+    shop_record = await shop_credentials_cache.get(shop)
 
     if not shop_record or not shop_record.access_token:
         raise HTTPException(
@@ -950,22 +1052,18 @@ async def get_shop_products_embedded(
     # Fetch products using stored access token
     try:
         shopify_api = ShopifyAPI(shop, shop_record.access_token)
-        products_data = await shopify_api.get_products_graphql(limit)
-
-        # Track usage
-        usage_record = ShopUsage(
-            shop_domain=shop,
-            metric_name="api_calls",
-            metric_value=1,
-            metric_data={"endpoint": "products_embedded", "limit": limit},
+        # Raw passthrough: Shopify's JSON body is returned as-is
+        products_data = await shopify_api.get_products_graphql_raw(limit)
+
+        # Track usage (batched write-behind)
+        usage_writer.record(
+            shop, "api_calls", 1, {"endpoint": "products_embedded", "limit": limit}
         )
-        session.add(usage_record)
-        await session.commit()
 
-        return products_data
+        return Response(content=products_data, media_type="application/json")
 
     except Exception as e:
-        logger.error(f"Error fetching products for {shop}: {e}")
+        logger.error("Error fetching products for %s: %s", shop, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch products: {str(e)}",
@@ -983,14 +1081,17 @@ async def bulk_get_products(
     """
     Get products from multiple shops (admin operation)
     """
-    query = select(Shop).where(Shop.uninstalled == False)
+    query = shop_credentials_query()
 
     if shop_domains:
         query = query.where(Shop.shop_domain.in_(shop_domains))
 
     query = query.limit(max_shops)
     result = await session.execute(query)
-    shops = result.scalars().all()
+    shops = result.all()
+
+    # Only the credential read needs the database
+    await session.release()
 
     results = {}
 
@@ -1015,7 +1116,7 @@ async def bulk_get_products(
             }
 
         except Exception as e:
-            logger.error(f"Error fetching products for {shop.shop_domain}: {e}")
+            logger.error("Error fetching products for %s: %s", shop.shop_domain, e)
             results[shop.shop_domain] = {"shop_name": shop.shop_name, "error": str(e)}
 
     return {"processed_shops": len(results), "results": results}
@@ -1025,7 +1126,7 @@ async def bulk_get_products(
 async def get_usage_analytics(
     days: int = Query(7, le=30, description="Number of days to analyze"),
     metric: Optional[str] = Query(None, description="Filter by metric name"),
-    session: AsyncSession = Depends(get_db_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
     Get usage analytics across all shops
@@ -1052,9 +1153,11 @@ async def get_usage_analytics(
             usage_data[shop_domain] = {}
         usage_data[shop_domain][metric_name] = {"total": total_value, "count": count}
 
-    return {
-        "period_days": days,
-        "metric_filter": metric,
-        "usage_by_shop": usage_data,
-        "generated_at": datetime.utcnow(),
-    }
+    return FastJSONResponse(
+        {
+            "period_days": days,
+            "metric_filter": metric,
+            "usage_by_shop": usage_data,
+            "generated_at": datetime.utcnow(),
+        }
+    )
@@ -1,18 +1,109 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, status, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import case, func, select
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 import logging
-import json
 
 from app.database import get_db_session
 from app.models import Shop, WebhookEvent
-from app.security import verify_webhook_hmac
+from app.security import HMACStream, decode_base64_digest, shopify_hmac_verifier
+from app.utils.json_codec import FastJSONResponse, JSONDecodeError, loads
+from app.utils.tracing import span
+from app.utils.credentials_cache import shop_credentials_cache
+from app.utils.metrics import (
+    webhook_processing_lag,
+    webhooks_processed,
+    webhooks_received,
+    webhooks_rejected,
+)
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/webhooks", tags=["webhooks"])
 
+# Largest initial body buffer (declared Content-Length is not trusted beyond it)
+DEFAULT_BODY_BUFFER_SIZE = 64 * 1024
+
+# Unique index on webhook_events.webhook_id
+WEBHOOK_ID_INDEX = "ix_webhook_events_webhook_id"
+
+
+async def read_webhook_body(
+    request: Request, hmac_stream: HMACStream, max_bytes: int
+) -> bytearray:
+    """
+    Read a webhook body chunk by chunk into a single buffer
+
+    The HMAC is updated as each chunk arrives and oversized bodies are
+    rejected as soon as they cross the limit, before being buffered.
+
+    Args:
+        request: Incoming request
+        hmac_stream: Incremental HMAC to feed with each chunk
+        max_bytes: Maximum accepted body size
+
+    Returns:
+        bytearray: Request body
+
+    Raises:
+        HTTPException: If the body is larger than max_bytes
+    """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail="Webhook payload too large",
+    )
+
+    content_length = request.headers.get("content-length")
+    try:
+        expected_size = int(content_length) if content_length else None
+    except ValueError:
+        expected_size = None
+
+    if expected_size is not None and expected_size > max_bytes:
+        webhooks_rejected.labels("too_large").inc()
+        raise too_large
+
+    # Preallocate for the declared size, so typical bodies are copied in
+    # exactly once. Capped: Content-Length is unauthenticated until the HMAC
+    # is checked, and larger bodies grow the buffer as their data arrives.
+    buffer = bytearray(
+        min(
+            expected_size if expected_size is not None else max_bytes,
+            DEFAULT_BODY_BUFFER_SIZE,
+            max_bytes,
+        )
+    )
+    size = 0
+
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+
+        end = size + len(chunk)
+        if end > max_bytes:
+            webhooks_rejected.labels("too_large").inc()
+            raise too_large
+
+        hmac_stream.update(chunk)
+
+        if end > len(buffer):
+            # Undeclared or wrong Content-Length: grow geometrically
+            new_size = max(end, min(len(buffer) * 2, max_bytes))
+            buffer.extend(bytes(new_size - len(buffer)))
+        buffer[size:end] = chunk
+        size = end
+
+    # Trim in place (no copy) to the bytes actually received
+    del buffer[size:]
+    return buffer
+
+
+def is_duplicate_delivery(error: IntegrityError) -> bool:
+    """Whether an insert failed on the unique X-Shopify-Webhook-Id index"""
+    diag = getattr(error.orig, "diag", None)
+    return getattr(diag, "constraint_name", None) == WEBHOOK_ID_INDEX
+
 
 @router.post("/shopify")
 async def handle_shopify_webhook(
@@ -32,32 +123,46 @@ async def handle_shopify_webhook(
 
     # Validate required headers
     if not all([topic, shop_domain, hmac_header]):
+        webhooks_rejected.labels("missing_headers").inc()
         logger.warning(
-            f"Missing webhook headers: topic={topic}, shop={shop_domain}, hmac={bool(hmac_header)}"
+            "Missing webhook headers: topic=%s, shop=%s, hmac=%s",
+            topic,
+            shop_domain,
+            bool(hmac_header),
         )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Missing required webhook headers",
         )
 
-    # Get raw body for HMAC verification
-    raw_body = await request.body()
+    # Stream the body, computing the HMAC as chunks arrive
+    hmac_stream = shopify_hmac_verifier.stream()
+    with span("webhook.read_body", topic=topic):
+        raw_body = await read_webhook_body(
+            request, hmac_stream, settings.webhook_max_body_bytes
+        )
 
     # Verify HMAC signature
-    if not verify_webhook_hmac(raw_body, hmac_header):
-        logger.warning(f"Invalid webhook HMAC for shop: {shop_domain}, topic: {topic}")
+    if not hmac_stream.verify(decode_base64_digest(hmac_header)):
+        webhooks_rejected.labels("invalid_hmac").inc()
+        logger.warning(
+            "Invalid webhook HMAC for shop: %s, topic: %s", shop_domain, topic
+        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid webhook signature"
         )
 
-    # Parse JSON payload
+    # Parse JSON payload straight from the bytes (no decoded str copy)
     try:
-        payload = json.loads(raw_body.decode("utf-8")) if raw_body else {}
-    except json.JSONDecodeError as e:
-        logger.error(f"Invalid JSON in webhook payload: {e}")
+        with span("webhook.parse", size=len(raw_body)):
+            payload = loads(raw_body) if raw_body else {}
+    except JSONDecodeError as e:
+        webhooks_rejected.labels("invalid_json").inc()
+        logger.error("Invalid JSON in webhook payload: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON payload"
         )
+    del raw_body
 
     # Store webhook event
     webhook_event = WebhookEvent(
@@ -69,10 +174,31 @@ async def handle_shopify_webhook(
         processed=False,
         received_at=datetime.utcnow(),
     )
-    session.add(webhook_event)
-    await session.commit()
+    with span("webhook.store", topic=topic):
+        session.add(webhook_event)
+        try:
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if not is_duplicate_delivery(e):
+                raise
+            # Shopify retried a delivery that was already stored
+            logger.info(
+                "Duplicate webhook %s: %s from %s",
+                webhook_id,
+                topic,
+                shop_domain,
+                extra={"shop": shop_domain, "topic": topic},
+            )
+            return {"status": "duplicate", "topic": topic, "shop": shop_domain}
 
-    logger.info(f"Received webhook: {topic} from {shop_domain}")
+    webhooks_received.labels(topic).inc()
+    logger.info(
+        "Received webhook: %s from %s",
+        topic,
+        shop_domain,
+        extra={"shop": shop_domain, "topic": topic},
+    )
 
     # Process webhook in background
     background_tasks.add_task(
@@ -97,6 +223,7 @@ async def process_webhook_event(
     from app.database import async_session_maker
 
     async with async_session_maker() as session:
+        webhook_event = None
         try:
             # Update webhook processing status
             result = await session.execute(
@@ -105,34 +232,52 @@ async def process_webhook_event(
             webhook_event = result.scalar_one_or_none()
 
             if not webhook_event:
-                logger.error(f"Webhook event not found: {webhook_event_id}")
+                logger.error("Webhook event not found: %s", webhook_event_id)
                 return
 
             # Process different webhook topics
-            if topic == "app/uninstalled":
-                await handle_app_uninstalled(session, shop_domain, payload)
-            elif topic == "orders/create":
-                await handle_order_created(session, shop_domain, payload)
-            elif topic == "orders/updated":
-                await handle_order_updated(session, shop_domain, payload)
-            elif topic == "products/create":
-                await handle_product_created(session, shop_domain, payload)
-            elif topic == "products/update":
-                await handle_product_updated(session, shop_domain, payload)
-            elif topic == "customers/create":
-                await handle_customer_created(session, shop_domain, payload)
-            else:
-                logger.info(f"Unhandled webhook topic: {topic}")
+            with span("webhook.handler", topic=topic, shop=shop_domain):
+                if topic == "app/uninstalled":
+                    await handle_app_uninstalled(session, shop_domain, payload)
+                elif topic == "orders/create":
+                    await handle_order_created(session, shop_domain, payload)
+                elif topic == "orders/updated":
+                    await handle_order_updated(session, shop_domain, payload)
+                elif topic == "products/create":
+                    await handle_product_created(session, shop_domain, payload)
+                elif topic == "products/update":
+                    await handle_product_updated(session, shop_domain, payload)
+                elif topic == "customers/create":
+                    await handle_customer_created(session, shop_domain, payload)
+                else:
+                    logger.info(
+                        "Unhandled webhook topic: %s", topic, extra={"topic": topic}
+                    )
 
             # Mark as processed
             webhook_event.processed = True
             webhook_event.processed_at = datetime.utcnow()
             await session.commit()
 
-            logger.info(f"Successfully processed webhook: {topic} for {shop_domain}")
+            # After the commit, so a concurrent miss cannot reload the old token
+            if topic == "app/uninstalled":
+                shop_credentials_cache.invalidate(shop_domain)
+
+            webhooks_processed.labels(topic, "success").inc()
+            webhook_processing_lag.labels(topic).observe(
+                (webhook_event.processed_at - webhook_event.received_at).total_seconds()
+            )
+
+            logger.info(
+                "Successfully processed webhook: %s for %s",
+                topic,
+                shop_domain,
+                extra={"shop": shop_domain, "topic": topic},
+            )
 
         except Exception as e:
-            logger.error(f"Error processing webhook {webhook_event_id}: {e}")
+            logger.error("Error processing webhook %s: %s", webhook_event_id, e)
+            webhooks_processed.labels(topic, "error").inc()
             # Update error status
             if webhook_event:
                 webhook_event.error_message = str(e)
@@ -150,7 +295,7 @@ async def handle_app_uninstalled(
         shop_domain: Shop domain
         payload: Webhook payload
     """
-    logger.info(f"Processing app uninstallation for: {shop_domain}")
+    logger.info("Processing app uninstallation for: %s", shop_domain)
 
     # Find and update shop record
     result = await session.execute(select(Shop).where(Shop.shop_domain == shop_domain))
@@ -162,9 +307,9 @@ async def handle_app_uninstalled(
         shop.access_token = None  # Clear access token for security
         shop.updated_at = datetime.utcnow()
 
-        logger.info(f"Marked shop as uninstalled: {shop_domain}")
+        logger.info("Marked shop as uninstalled: %s", shop_domain)
     else:
-        logger.warning(f"Shop not found for uninstallation: {shop_domain}")
+        logger.warning("Shop not found for uninstallation: %s", shop_domain)
 
 
 async def handle_order_created(session: AsyncSession, shop_domain: str, payload: dict):
@@ -181,7 +326,11 @@ async def handle_order_created(session: AsyncSession, shop_domain: str, payload:
     total_price = payload.get("total_price")
 
     logger.info(
-        f"New order created - Shop: {shop_domain}, Order: #{order_number}, Total: {total_price}"
+        "New order created - Shop: %s, Order: #%s, Total: %s",
+        shop_domain,
+        order_number,
+        total_price,
+        extra={"shop": shop_domain, "topic": "orders/create"},
     )
 
     # Add your custom order processing logic here
@@ -203,7 +352,12 @@ async def handle_order_updated(session: AsyncSession, shop_domain: str, payload:
     fulfillment_status = payload.get("fulfillment_status")
 
     logger.info(
-        f"Order updated - Shop: {shop_domain}, Order: #{order_number}, Financial: {financial_status}, Fulfillment: {fulfillment_status}"
+        "Order updated - Shop: %s, Order: #%s, Financial: %s, Fulfillment: %s",
+        shop_domain,
+        order_number,
+        financial_status,
+        fulfillment_status,
+        extra={"shop": shop_domain, "topic": "orders/updated"},
     )
 
 
@@ -224,7 +378,12 @@ async def handle_product_created(
     vendor = payload.get("vendor")
 
     logger.info(
-        f"New product created - Shop: {shop_domain}, Product: {product_title}, Type: {product_type}, Vendor: {vendor}"
+        "New product created - Shop: %s, Product: %s, Type: %s, Vendor: %s",
+        shop_domain,
+        product_title,
+        product_type,
+        vendor,
+        extra={"shop": shop_domain, "topic": "products/create"},
     )
 
 
@@ -242,7 +401,12 @@ async def handle_product_updated(
     product_id = payload.get("id")
     product_title = payload.get("title")
 
-    logger.info(f"Product updated - Shop: {shop_domain}, Product: {product_title}")
+    logger.info(
+        "Product updated - Shop: %s, Product: %s",
+        shop_domain,
+        product_title,
+        extra={"shop": shop_domain, "topic": "products/update"},
+    )
 
 
 async def handle_customer_created(
@@ -262,7 +426,12 @@ async def handle_customer_created(
     last_name = payload.get("last_name")
 
     logger.info(
-        f"New customer created - Shop: {shop_domain}, Email: {customer_email}, Name: {first_name} {last_name}"
+        "New customer created - Shop: %s, Email: %s, Name: %s %s",
+        shop_domain,
+        customer_email,
+        first_name,
+        last_name,
+        extra={"shop": shop_domain, "topic": "customers/create"},
     )
 
 
@@ -281,7 +450,28 @@ async def list_webhook_events(
         topic: Filter by topic (optional)
         limit: Maximum number of events to return
     """
-    query = select(WebhookEvent).order_by(WebhookEvent.received_at.desc())
+    # Payload keys are listed in SQL, so payloads never leave the database
+    # (json_object_keys fails on arrays and scalars, which list no keys)
+    payload_key = func.json_object_keys(
+        case(
+            (func.json_typeof(WebhookEvent.payload) == "object", WebhookEvent.payload),
+            else_=None,
+        )
+    ).column_valued("key")
+    payload_keys = select(func.array_agg(payload_key)).scalar_subquery()
+
+    # Project columns only; the stored headers are never needed here
+    query = select(
+        WebhookEvent.id,
+        WebhookEvent.shop_domain,
+        WebhookEvent.topic,
+        WebhookEvent.webhook_id,
+        WebhookEvent.processed,
+        WebhookEvent.processed_at,
+        WebhookEvent.received_at,
+        WebhookEvent.error_message,
+        payload_keys.label("payload_keys"),
+    ).order_by(WebhookEvent.received_at.desc())
 
     if shop:
         query = query.where(WebhookEvent.shop_domain == shop)
@@ -291,22 +481,24 @@ async def list_webhook_events(
     query = query.limit(limit)
 
     result = await session.execute(query)
-    events = result.scalars().all()
-
-    return {
-        "events": [
-            {
-                "id": event.id,
-                "shop_domain": event.shop_domain,
-                "topic": event.topic,
-                "webhook_id": event.webhook_id,
-                "processed": event.processed,
-                "processed_at": event.processed_at,
-                "received_at": event.received_at,
-                "error_message": event.error_message,
-                "payload_keys": list(event.payload.keys()) if event.payload else [],
-            }
-            for event in events
-        ],
-        "total": len(events),
-    }
+    events = result.all()
+
+    return FastJSONResponse(
+        {
+            "events": [
+                {
+                    "id": event.id,
+                    "shop_domain": event.shop_domain,
+                    "topic": event.topic,
+                    "webhook_id": event.webhook_id,
+                    "processed": event.processed,
+                    "processed_at": event.processed_at,
+                    "received_at": event.received_at,
+                    "error_message": event.error_message,
+                    "payload_keys": event.payload_keys or [],
+                }
+                for event in events
+            ],
+            "total": len(events),
+        }
+    )
@@ -2,10 +2,14 @@ import re
 import hmac
 import hashlib
 import base64
-from typing import Mapping, Optional
+import binascii
+import time
+from collections import OrderedDict
+from typing import List, Mapping, Optional, Tuple, Union
 from jose import jwt, JWTError
 from fastapi import HTTPException, status
 from app.config import settings
+from app.utils.metrics import registry
 
 # Shop domain validation regex
 SHOP_DOMAIN_REGEX = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9-]*\.myshopify\.com$")
@@ -26,6 +30,104 @@ def is_valid_shop_domain(shop_domain: str) -> bool:
     return bool(SHOP_DOMAIN_REGEX.match(shop_domain))
 
 
+class HMACStream:
+    """
+    Incremental HMAC-SHA256 over a message received in chunks
+
+    Holds one HMAC state per accepted secret.
+    """
+
+    __slots__ = ("_states",)
+
+    def __init__(self, states: list):
+        self._states = states
+
+    def update(self, chunk: Union[bytes, bytearray, memoryview]):
+        """Feed the next chunk of the message"""
+        for state in self._states:
+            state.update(chunk)
+
+    def verify(self, expected_digest: Optional[bytes]) -> bool:
+        """
+        Compare the final digest with the expected raw digest
+
+        Args:
+            expected_digest: Raw (decoded) digest from the request
+
+        Returns:
+            bool: True if any accepted secret produced the digest
+        """
+        if not expected_digest:
+            return False
+        valid = False
+        for state in self._states:
+            # No short-circuit: every secret is compared in constant time
+            valid |= hmac.compare_digest(state.digest(), expected_digest)
+        return valid
+
+
+class HMACVerifier:
+    """
+    HMAC-SHA256 verifier with precomputed keyed states
+
+    The key schedule for each secret runs once; every verification starts
+    from a `.copy()` of the keyed state. Several secrets can be accepted at
+    once to allow rotation.
+    """
+
+    def __init__(self, secrets: List[str]):
+        self._keyed = [
+            hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+            for secret in secrets
+            if secret
+        ]
+
+    def stream(self) -> HMACStream:
+        """Start an incremental verification"""
+        return HMACStream([state.copy() for state in self._keyed])
+
+    def verify(
+        self, message: Union[bytes, bytearray, memoryview], expected_digest: bytes
+    ) -> bool:
+        """
+        Verify a complete message against a raw digest
+
+        Args:
+            message: Message bytes
+            expected_digest: Raw (decoded) digest
+
+        Returns:
+            bool: True if any accepted secret produced the digest
+        """
+        stream = self.stream()
+        stream.update(message)
+        return stream.verify(expected_digest)
+
+
+def decode_base64_digest(value: Optional[str]) -> Optional[bytes]:
+    """Decode a base64 digest header, returning None if malformed"""
+    if not value:
+        return None
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def decode_hex_digest(value: Optional[str]) -> Optional[bytes]:
+    """Decode a hex digest parameter, returning None if malformed"""
+    if not value:
+        return None
+    try:
+        return bytes.fromhex(value)
+    except ValueError:
+        return None
+
+
+# Keyed with the Shopify API secret(s), shared by webhook and OAuth checks
+shopify_hmac_verifier = HMACVerifier(settings.shopify_api_secrets_list)
+
+
 def verify_oauth_hmac(query_params: Mapping[str, str]) -> bool:
     """
     Verify HMAC signature for OAuth callback
@@ -47,18 +149,15 @@ def verify_oauth_hmac(query_params: Mapping[str, str]) -> bool:
     sorted_params = sorted(params.items())
     query_string = "&".join(f"{key}={value}" for key, value in sorted_params)
 
-    # Calculate HMAC
-    calculated_hmac = hmac.new(
-        settings.shopify_api_secret.encode("utf-8"),
-        query_string.encode("utf-8"),
-        hashlib.sha256,
-    ).hexdigest()
+    # Compare raw digests using constant-time comparison
+    return shopify_hmac_verifier.verify(
+        query_string.encode("utf-8"), decode_hex_digest(received_hmac)
+    )
 
-    # Compare HMACs using constant-time comparison
-    return hmac.compare_digest(calculated_hmac, received_hmac)
 
-
-def verify_webhook_hmac(raw_body: bytes, hmac_header: Optional[str]) -> bool:
+def verify_webhook_hmac(
+    raw_body: Union[bytes, bytearray, memoryview], hmac_header: Optional[str]
+) -> bool:
     """
     Verify HMAC signature for webhook requests
 
@@ -69,25 +168,107 @@ def verify_webhook_hmac(raw_body: bytes, hmac_header: Optional[str]) -> bool:
     Returns:
         bool: True if HMAC is valid
     """
-    if not hmac_header:
+    expected_digest = decode_base64_digest(hmac_header)
+    if not expected_digest:
         return False
 
-    # Calculate HMAC of raw body
-    calculated_hmac = hmac.new(
-        settings.shopify_api_secret.encode("utf-8"), raw_body, hashlib.sha256
-    ).digest()
+    # Compare the raw digest with the decoded header
+    return shopify_hmac_verifier.verify(raw_body, expected_digest)
 
-    # Encode as base64
-    calculated_hmac_b64 = base64.b64encode(calculated_hmac).decode("utf-8")
 
-    # Compare with received HMAC
-    return hmac.compare_digest(calculated_hmac_b64, hmac_header)
+class SessionTokenCache:
+    """
+    Bounded LRU cache of verified session token payloads
+
+    Entries are keyed by a SHA-256 digest of the token (the raw token is never
+    stored) and are only served until the token's own `exp`.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """
+        Get the cached payload for a token that has not expired yet
+
+        Args:
+            token: JWT session token
+
+        Returns:
+            dict: Decoded payload or None on a miss
+        """
+        key = self._key(token)
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        payload, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict):
+        """
+        Cache a verified payload until the token's `exp`
+
+        Args:
+            token: JWT session token
+            payload: Decoded and verified payload
+        """
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)) or self.max_size <= 0:
+            return
+
+        key = self._key(token)
+        self._entries[key] = (payload, float(expires_at))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Cache size and hit/miss counters"""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Verified session tokens for this worker
+session_token_cache = SessionTokenCache(settings.session_token_cache_size)
+registry.callback_counter(
+    "session_token_cache_lookups_total",
+    "Session token cache lookups since startup",
+    ("result",),
+    lambda: [
+        (("hit",), session_token_cache.hits),
+        (("miss",), session_token_cache.misses),
+    ],
+)
 
 
 def verify_session_token(token: str, expected_shop: str) -> dict:
     """
     Verify and decode Shopify session token (JWT)
 
+    Tokens verified before are served from `session_token_cache` until they
+    expire; only the shop match is re-checked.
+
     Args:
         token: JWT session token
         expected_shop: Expected shop domain
@@ -98,32 +279,40 @@ def verify_session_token(token: str, expected_shop: str) -> dict:
     Raises:
         HTTPException: If token is invalid
     """
-    try:
-        # Decode JWT token
-        payload = jwt.decode(
-            token,
-            settings.shopify_api_secret,
-            algorithms=[settings.algorithm],
-            audience=settings.shopify_api_key,
-            options={"verify_aud": True, "verify_exp": True, "verify_signature": True},
-        )
-
-        # Verify shop domain matches
-        dest = payload.get("dest") or payload.get("iss", "")
-        if expected_shop not in dest:
+    payload = session_token_cache.get(token)
+
+    if payload is None:
+        try:
+            # Decode JWT token
+            payload = jwt.decode(
+                token,
+                settings.shopify_api_secret,
+                algorithms=[settings.algorithm],
+                audience=settings.shopify_api_key,
+                options={
+                    "verify_aud": True,
+                    "verify_exp": True,
+                    "verify_signature": True,
+                },
+            )
+        except JWTError as e:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Session token shop mismatch",
+                detail=f"Invalid session token: {str(e)}",
             )
 
-        return payload
+        session_token_cache.put(token, payload)
 
-    except JWTError as e:
+    # Verify shop domain matches
+    dest = payload.get("dest") or payload.get("iss", "")
+    if expected_shop not in dest:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Invalid session token: {str(e)}",
+            detail="Session token shop mismatch",
         )
 
+    return payload
+
 
 def create_access_token(data: dict) -> str:
     """
@@ -160,3 +349,31 @@ def verify_access_token(token: str) -> dict:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid access token"
         )
+
+
+def verify_admin_token(authorization: Optional[str]) -> dict:
+    """
+    Verify a bearer access token that carries the admin role
+
+    Args:
+        authorization: Authorization header value
+
+    Returns:
+        dict: Decoded token payload
+
+    Raises:
+        HTTPException: If the header is missing, the token is invalid, or the
+            token does not have role=admin
+    """
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing or invalid authorization header",
+        )
+
+    payload = verify_access_token(authorization.split(" ", 1)[1])
+    if payload.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
+        )
+    return payload
@@ -0,0 +1,186 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Callable, Dict, Optional, Sequence
+import gzip
+import anyio
+
+# Optional encoders; gzip is always available
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+# Content types worth compressing (prefix match)
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def build_encoders(
+    gzip_level: int = 6, brotli_quality: int = 4, zstd_level: int = 3
+) -> Dict[str, Callable[[bytes], bytes]]:
+    """
+    Build the available encoders in server preference order
+
+    Args:
+        gzip_level: gzip compression level (1-9)
+        brotli_quality: brotli quality (0-11), used if brotli is installed
+        zstd_level: zstd level, used if zstandard is installed
+
+    Returns:
+        dict: Content-Encoding name -> compress function
+    """
+    encoders: Dict[str, Callable[[bytes], bytes]] = {}
+
+    if brotli is not None:
+        encoders["br"] = lambda data: brotli.compress(data, quality=brotli_quality)
+    if zstandard is not None:
+        zstd_compressor = zstandard.ZstdCompressor(level=zstd_level)
+        encoders["zstd"] = zstd_compressor.compress
+    encoders["gzip"] = lambda data: gzip.compress(
+        data, compresslevel=gzip_level, mtime=0
+    )
+
+    return encoders
+
+
+def select_encoding(accept_encoding: str, available: Sequence[str]) -> Optional[str]:
+    """
+    Pick the preferred available encoding accepted by the client
+
+    Args:
+        accept_encoding: Accept-Encoding header value
+        available: Encodings in server preference order
+
+    Returns:
+        str: Encoding name or None if nothing acceptable is available
+    """
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Response compression middleware
+
+    Only complete (single-message) responses are compressed; streaming
+    responses pass through untouched. Bodies smaller than `minimum_size`,
+    non-text content types and `excluded_paths` are never compressed, and
+    bodies of at least `threadpool_min_size` bytes are compressed in a worker
+    thread so the event loop is not blocked.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+        threadpool_min_size: int = 256 * 1024,
+        excluded_paths: Sequence[str] = (),
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.threadpool_min_size = threadpool_min_size
+        self.excluded_paths = tuple(excluded_paths)
+        self.encoders = build_encoders(gzip_level, brotli_quality, zstd_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(self.excluded_paths):
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = select_encoding(accept_encoding, list(self.encoders))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Per-request send wrapper that buffers the start message"""
+
+    def __init__(self, middleware: CompressionMiddleware, send: Send, encoding: str):
+        self.middleware = middleware
+        self.inner_send = send
+        self.encoding = encoding
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.inner_send(message)
+            return
+
+        start_message, self.start_message = self.start_message, None
+        if start_message is None:
+            # Later chunk of a streaming response
+            await self.inner_send(message)
+            return
+
+        body = message.get("body", b"")
+        headers = MutableHeaders(scope=start_message)
+
+        if (
+            message.get("more_body", False)
+            or not self._should_compress(start_message["status"], headers, body)
+        ):
+            self.passthrough = True
+            await self.inner_send(start_message)
+            await self.inner_send(message)
+            return
+
+        compress = self.middleware.encoders[self.encoding]
+        if len(body) >= self.middleware.threadpool_min_size:
+            body = await anyio.to_thread.run_sync(compress, body)
+        else:
+            body = compress(body)
+
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(body))
+        headers.add_vary_header("Accept-Encoding")
+
+        await self.inner_send(start_message)
+        await self.inner_send({"type": "http.response.body", "body": body})
+
+    def _should_compress(self, status: int, headers: MutableHeaders, body: bytes):
+        if status < 200 or status in (204, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        if len(body) < self.middleware.minimum_size:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
@@ -0,0 +1,85 @@
+from sqlalchemy.engine import Row
+from typing import Dict, Optional, Tuple
+import asyncio
+import time
+
+from app.config import settings
+from app.database import engine
+from app.utils.shop_queries import get_shop_credentials
+
+
+class ShopCredentialsCache:
+    """
+    Short-lived per-worker cache of installed shops' credentials
+
+    Misses are loaded with a single autocommit read on a connection that is
+    returned to the pool immediately, and concurrent misses for one shop
+    share a single query. Entries are dropped on reinstall and uninstall in
+    this worker; other workers pick up changes within `ttl_seconds`.
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0, max_size: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: Dict[str, Tuple[float, Row]] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+        # Bumped on invalidation so loads started earlier are not cached
+        self._generation = 0
+
+    async def _load(self, shop_domain: str) -> Optional[Row]:
+        async with engine.connect() as conn:
+            return await get_shop_credentials(conn, shop_domain)
+
+    async def get(self, shop_domain: str) -> Optional[Row]:
+        """
+        Get an installed shop's credentials
+
+        Args:
+            shop_domain: Shop domain
+
+        Returns:
+            Row: (shop_domain, shop_name, access_token) or None if not installed
+        """
+        entry = self._entries.get(shop_domain)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        # One shared load per shop; shielded so a cancelled caller does not
+        # cancel it for the others
+        loading = self._loading.get(shop_domain)
+        if loading is None:
+            loading = self._loading[shop_domain] = asyncio.ensure_future(
+                self._load(shop_domain)
+            )
+            generation = self._generation
+            loading.add_done_callback(
+                lambda task: self._loaded(shop_domain, task, generation)
+            )
+        return await asyncio.shield(loading)
+
+    def _loaded(self, shop_domain: str, task: asyncio.Task, generation: int):
+        if self._loading.get(shop_domain) is task:
+            del self._loading[shop_domain]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if generation != self._generation:
+            return
+
+        # Not-installed shops are not cached so installs show up immediately
+        row = task.result()
+        if row is not None:
+            if len(self._entries) >= self.max_size:
+                self._entries.clear()
+            self._entries[shop_domain] = (time.monotonic() + self.ttl_seconds, row)
+
+    def invalidate(self, shop_domain: str):
+        """Drop a shop's cached credentials (token changed or app uninstalled)"""
+        self._entries.pop(shop_domain, None)
+        self._loading.pop(shop_domain, None)
+        self._generation += 1
+
+
+# Global cache instance
+shop_credentials_cache = ShopCredentialsCache(
+    ttl_seconds=settings.shop_credentials_cache_ttl_seconds
+)
@@ -0,0 +1,147 @@
+from fastapi import Request
+from fastapi.responses import Response
+from typing import Any, Iterable, Optional
+import hashlib
+
+from app.utils.json_codec import JSONDecodeError, dumps, loads
+
+
+def compute_etag(content: bytes) -> str:
+    """
+    Build a weak ETag from a content hash
+
+    ETags are weak so they stay valid when the compression middleware
+    re-encodes the body.
+
+    Args:
+        content: Response body bytes
+
+    Returns:
+        str: ETag header value
+    """
+    return f'W/"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
+
+def version_etag(*parts: Any) -> str:
+    """
+    Build a weak ETag from version markers (timestamps, counters, ids)
+
+    Args:
+        parts: Values that change whenever the resource changes
+
+    Returns:
+        str: ETag header value
+    """
+    return compute_etag("|".join(str(part) for part in parts).encode("utf-8"))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag (weak comparison)
+
+    Args:
+        if_none_match: If-None-Match header value
+        etag: Current ETag
+
+    Returns:
+        bool: True if the client's cached copy is current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+    return False
+
+
+def not_modified_response(request: Request, etag: str) -> Optional[Response]:
+    """
+    Return a 304 response if the request's If-None-Match matches
+
+    Args:
+        request: Incoming request
+        etag: Current ETag
+
+    Returns:
+        Response: 304 Not Modified, or None if the body must be sent
+    """
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def raw_json_response_with_etag(
+    request: Request, body: bytes, volatile_keys: Iterable[str] = ()
+) -> Response:
+    """
+    Send pre-encoded JSON with a content-hash ETag, or 304 if unchanged
+
+    The body is always sent as-is. With `volatile_keys`, the hash covers the
+    parsed object without those top-level keys.
+
+    Args:
+        request: Incoming request
+        body: JSON response body
+        volatile_keys: Top-level keys left out of the hash (e.g. extensions)
+
+    Returns:
+        Response: 200 with ETag or 304 Not Modified
+    """
+    volatile_keys = set(volatile_keys)
+    hashed = body
+    if volatile_keys:
+        try:
+            content = loads(body)
+        except JSONDecodeError:
+            content = None
+        if isinstance(content, dict):
+            hashed = dumps(
+                {k: v for k, v in content.items() if k not in volatile_keys}
+            )
+
+    etag = compute_etag(hashed)
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def json_response_with_etag(
+    request: Request, content: dict, volatile_keys: Iterable[str] = ()
+) -> Response:
+    """
+    Send JSON with a content-hash ETag, or 304 if unchanged
+
+    Args:
+        request: Incoming request
+        content: Response content
+        volatile_keys: Top-level keys left out of the hash (e.g. generated_at)
+
+    Returns:
+        Response: 200 with ETag or 304 Not Modified
+    """
+    volatile_keys = set(volatile_keys)
+    if volatile_keys:
+        body = None
+        etag = compute_etag(
+            dumps({k: v for k, v in content.items() if k not in volatile_keys})
+        )
+    else:
+        body = dumps(content)
+        etag = compute_etag(body)
+
+    not_modified = not_modified_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    if body is None:
+        body = dumps(content)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
@@ -0,0 +1,191 @@
+from sqlalchemy import select, func, text
+from datetime import datetime
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.database import engine
+from app.models import WebhookEvent
+from app.utils.loop_monitor import loop_monitor
+
+logger = logging.getLogger(__name__)
+
+
+def pool_utilization(pool) -> Optional[float]:
+    """
+    Fraction of the pool's maximum connections currently checked out
+
+    Args:
+        pool: SQLAlchemy connection pool
+
+    Returns:
+        float: 0.0-1.0, or None for pools without a fixed size
+    """
+    if not hasattr(pool, "checkedout") or not hasattr(pool, "size"):
+        return None
+    max_overflow = max(getattr(pool, "_max_overflow", 0), 0)
+    capacity = pool.size() + max_overflow
+    if capacity <= 0:
+        return None
+    return pool.checkedout() / capacity
+
+
+async def measure_loop_lag() -> float:
+    """
+    Measure how long a callback waits to be scheduled on the event loop
+
+    Returns:
+        float: Scheduling delay in seconds
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    scheduled = time.perf_counter()
+    loop.call_soon(lambda: future.done() or future.set_result(time.perf_counter()))
+    return await future - scheduled
+
+
+class ReadinessChecker:
+    """
+    Cached readiness check
+
+    Every probe within `cache_seconds` of the last check gets the cached
+    result, and concurrent probes share a single in-flight check, so probes
+    add at most one DB ping and one bounded backlog query per interval.
+    """
+
+    def __init__(
+        self,
+        cache_seconds: float = 2.0,
+        db_timeout_seconds: float = 1.0,
+        max_pool_utilization: float = 0.9,
+        max_loop_lag_seconds: float = 0.25,
+        max_webhook_backlog: int = 1000,
+    ):
+        self.cache_seconds = cache_seconds
+        self.db_timeout_seconds = db_timeout_seconds
+        self.max_pool_utilization = max_pool_utilization
+        self.max_loop_lag_seconds = max_loop_lag_seconds
+        self.max_webhook_backlog = max_webhook_backlog
+        self._result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _check_database(self) -> Dict[str, Any]:
+        """Ping the database and count unprocessed webhooks (bounded)"""
+        # Count at most max_webhook_backlog + 1 rows so the query stays cheap
+        # however large the backlog gets; the predicate matches the partial
+        # index ix_webhook_events_unprocessed, so only pending rows are read
+        backlog = (
+            select(WebhookEvent.id)
+            .where(
+                WebhookEvent.processed == False,
+                WebhookEvent.error_message.is_(None),
+            )
+            .limit(self.max_webhook_backlog + 1)
+            .subquery()
+        )
+
+        started = time.perf_counter()
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            ping_seconds = time.perf_counter() - started
+            depth = await conn.scalar(select(func.count()).select_from(backlog))
+
+        return {"ping_seconds": ping_seconds, "webhook_backlog": depth}
+
+    async def _run_checks(self) -> Dict[str, Any]:
+        checks: Dict[str, Any] = {}
+
+        # Database ping and webhook queue depth
+        try:
+            db = await asyncio.wait_for(
+                self._check_database(), timeout=self.db_timeout_seconds
+            )
+            checks["database"] = {
+                "ok": True,
+                "ping_ms": round(db["ping_seconds"] * 1000, 2),
+            }
+            depth = db["webhook_backlog"]
+            checks["webhook_backlog"] = {
+                "ok": depth <= self.max_webhook_backlog,
+                "depth": depth,
+                "threshold": self.max_webhook_backlog,
+            }
+        except asyncio.TimeoutError:
+            checks["database"] = {"ok": False, "error": "timeout"}
+        except Exception as e:
+            logger.warning("Readiness database check failed: %s", e)
+            checks["database"] = {"ok": False, "error": type(e).__name__}
+
+        # Pool saturation
+        utilization = pool_utilization(engine.pool)
+        if utilization is not None:
+            checks["db_pool"] = {
+                "ok": utilization < self.max_pool_utilization,
+                "utilization": round(utilization, 3),
+                "threshold": self.max_pool_utilization,
+            }
+
+        # Event loop lag: p99 over the loop monitor's window, or a single
+        # sample if the monitor is disabled or has not sampled yet
+        percentiles = loop_monitor.percentiles()
+        if "p99" in percentiles:
+            lag, source = percentiles["p99"], "p99"
+        else:
+            lag, source = await measure_loop_lag(), "sample"
+        checks["event_loop"] = {
+            "ok": lag <= self.max_loop_lag_seconds,
+            "lag_ms": round(lag * 1000, 2),
+            "source": source,
+            "threshold_ms": round(self.max_loop_lag_seconds * 1000, 2),
+        }
+        if "max" in percentiles:
+            checks["event_loop"]["max_ms"] = round(percentiles["max"] * 1000, 2)
+
+        ready = all(check["ok"] for check in checks.values())
+        return {
+            "status": "ready" if ready else "not_ready",
+            "checks": checks,
+            "checked_at": datetime.utcnow().isoformat() + "Z",
+        }
+
+    def _cached(self) -> Optional[Dict[str, Any]]:
+        if (
+            self._result is not None
+            and time.monotonic() - self._checked_at < self.cache_seconds
+        ):
+            return self._result
+        return None
+
+    async def check(self) -> Dict[str, Any]:
+        """
+        Run the readiness checks, or return the cached result
+
+        Returns:
+            dict: Overall status and per-check details
+        """
+        result = self._cached()
+        if result is not None:
+            return result
+
+        async with self._lock:
+            # Another probe may have refreshed the result while we waited
+            result = self._cached()
+            if result is not None:
+                return result
+
+            self._result = await self._run_checks()
+            self._checked_at = time.monotonic()
+            return self._result
+
+
+# Global readiness checker instance
+readiness_checker = ReadinessChecker(
+    cache_seconds=settings.health_cache_seconds,
+    db_timeout_seconds=settings.health_db_timeout_seconds,
+    max_pool_utilization=settings.health_max_pool_utilization,
+    max_loop_lag_seconds=settings.health_max_loop_lag_seconds,
+    max_webhook_backlog=settings.health_max_webhook_backlog,
+)
@@ -0,0 +1,64 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Union
+from fastapi.responses import JSONResponse
+import json
+
+# orjson is optional; every function falls back to the stdlib json module
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# Raised by loads() for malformed input (orjson.JSONDecodeError and
+# json.JSONDecodeError both subclass ValueError, as does UnicodeDecodeError)
+JSONDecodeError = ValueError
+
+
+def _default(obj: Any) -> Any:
+    """Serialize types neither encoder handles natively"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """Parse JSON from bytes or str"""
+        return orjson.loads(data)
+
+else:
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes"""
+        return json.dumps(
+            obj, default=_default, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """Parse JSON from bytes or str"""
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+
+def dumps_str(obj: Any) -> str:
+    """Serialize to a JSON str (for drivers that expect text)"""
+    return dumps(obj).decode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the fast codec (orjson when available)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
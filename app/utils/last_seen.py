@@ -0,0 +1,130 @@
+from sqlalchemy import update, values, column, func, String, DateTime
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import asyncio
+import logging
+
+from app.config import settings
+from app.database import engine
+from app.models import Shop
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class LastSeenTracker:
+    """
+    Write-behind tracker for Shop.last_seen_at
+
+    Activity is recorded in memory and flushed periodically as one batched
+    UPDATE ... FROM (VALUES ...) statement. Timestamps are truncated to the
+    configured precision, so a shop is written at most once per precision
+    window no matter how many requests it makes.
+    """
+
+    def __init__(self, precision_seconds: int = 60, flush_interval: float = 30.0):
+        self.precision_seconds = max(1, precision_seconds)
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, datetime] = {}
+        self._flushed: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _truncate(self, when: datetime) -> datetime:
+        """Round a timestamp down to the tracker precision"""
+        offset = (when - EPOCH).total_seconds()
+        return EPOCH + timedelta(seconds=offset - offset % self.precision_seconds)
+
+    def touch(self, shop_domain: str, when: Optional[datetime] = None):
+        """
+        Record activity for a shop
+
+        Args:
+            shop_domain: Shop domain
+            when: Activity time (defaults to now, UTC)
+        """
+        seen_at = self._truncate(when or datetime.utcnow())
+
+        # Skip shops already written (or queued) for this precision window
+        if self._flushed.get(shop_domain) == seen_at:
+            return
+        pending = self._pending.get(shop_domain)
+        if pending is None or seen_at > pending:
+            self._pending[shop_domain] = seen_at
+
+    async def flush(self) -> int:
+        """
+        Write pending timestamps in one batched UPDATE
+
+        Returns:
+            int: Number of shops flushed
+        """
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, {}
+
+        rows = values(
+            column("shop_domain", String),
+            column("last_seen_at", DateTime),
+            name="seen",
+        ).data(list(batch.items()))
+
+        stmt = (
+            update(Shop.__table__)
+            .where(Shop.shop_domain == rows.c.shop_domain)
+            .values(
+                last_seen_at=func.greatest(Shop.last_seen_at, rows.c.last_seen_at)
+            )
+        )
+
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(stmt)
+        except Exception as e:
+            logger.error("Failed to flush last_seen_at for %d shops: %s", len(batch), e)
+            # Requeue so the next flush retries, keeping the newest timestamp
+            for shop_domain, seen_at in batch.items():
+                pending = self._pending.get(shop_domain)
+                if pending is None or seen_at > pending:
+                    self._pending[shop_domain] = seen_at
+            return 0
+
+        self._flushed.update(batch)
+        return len(batch)
+
+    async def _run(self):
+        """Flush loop"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            # Forget windows that have passed so the map stays bounded
+            horizon = self._truncate(datetime.utcnow())
+            self._flushed = {
+                shop: seen_at
+                for shop, seen_at in self._flushed.items()
+                if seen_at >= horizon
+            }
+
+    def start(self):
+        """Start the periodic flush task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write anything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+# Global tracker instance
+last_seen_tracker = LastSeenTracker(
+    precision_seconds=settings.last_seen_precision_seconds,
+    flush_interval=settings.last_seen_flush_interval_seconds,
+)
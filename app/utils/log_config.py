@@ -0,0 +1,167 @@
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+import atexit
+import logging
+import queue
+import sys
+import time
+
+from app.utils.json_codec import dumps_str
+
+# Attributes every LogRecord has; anything else was passed via `extra`
+_RECORD_ATTRIBUTES = frozenset(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", (), None)).keys()
+) | {"message", "asctime"}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(
+                record.created, tz=timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return dumps_str(entry)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Rate-limit high-volume messages per shop and topic
+
+    Records below WARNING that carry a `shop` or `topic` extra are allowed
+    `limit` times per `window_seconds` for each (message template, shop,
+    topic) key; the rest are dropped before they are queued. The next record
+    let through for a key reports how many were dropped as `sampled_out`.
+    """
+
+    def __init__(self, limit: int = 20, window_seconds: float = 60.0):
+        super().__init__()
+        self.limit = limit
+        self.window_seconds = window_seconds
+        # key -> [window start, emitted, dropped]
+        self._windows: Dict[Tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.limit <= 0:
+            return True
+
+        shop = getattr(record, "shop", None)
+        topic = getattr(record, "topic", None)
+        if shop is None and topic is None:
+            return True
+
+        key = (record.name, record.msg, shop, topic)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.window_seconds:
+            dropped = window[2] if window is not None else 0
+            if len(self._windows) > 10000:
+                # Bound memory when many shops are active
+                self._windows.clear()
+            window = self._windows[key] = [now, 0, 0]
+            if dropped:
+                record.sampled_out = dropped
+
+        if window[1] >= self.limit:
+            window[2] += 1
+            return False
+
+        window[1] += 1
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue handler that never formats or blocks in the calling thread
+
+    Formatting is left to the listener thread, and records are dropped
+    (and counted) when the queue is full instead of blocking the loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = "json",
+    queue_size: int = 10000,
+    sample_limit: int = 20,
+    sample_window_seconds: float = 60.0,
+) -> QueueListener:
+    """
+    Route all logging through a queue to a background writer thread
+
+    Args:
+        level: Root log level
+        log_format: 'json' for structured output, 'text' for plain lines
+        queue_size: Maximum queued records before new ones are dropped
+        sample_limit: Records per shop/topic/message per window (0 disables)
+        sample_window_seconds: Sampling window length
+
+    Returns:
+        QueueListener: The running listener
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(
+        JSONFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    queue_handler = _NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_limit, sample_window_seconds))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level.upper())
+
+    # Uvicorn's loggers propagate to the root logger instead of writing
+    # directly to the stream
+    for name in ("uvicorn", "uvicorn.access", "uvicorn.error"):
+        logging.getLogger(name).handlers[:] = []
+        logging.getLogger(name).propagate = True
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,150 @@
+from collections import deque
+from typing import Deque, Dict, Optional
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from app.config import settings
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LAG_QUANTILES = (0.5, 0.9, 0.99)
+
+event_loop_lag = registry.histogram(
+    "event_loop_lag_seconds",
+    "Event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+# Only incremented from the watchdog thread, so it still has a single writer
+event_loop_slow_callbacks = registry.counter(
+    "event_loop_slow_callbacks_total",
+    "Callbacks that blocked the event loop longer than the threshold",
+)
+
+
+class LoopMonitor:
+    """
+    Event loop lag monitor and slow-callback detector
+
+    A sampler task sleeps for `interval` and records how late it wakes up
+    (the loop's scheduling delay). A watchdog thread watches the sampler's
+    expected wake-up time: if the loop is still blocked `slow_callback_seconds`
+    past it, the thread captures the loop thread's current stack, which
+    points at the callback doing the blocking work.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        slow_callback_seconds: float = 0.1,
+        window: int = 1200,
+    ):
+        self.interval = interval
+        self.slow_callback_seconds = slow_callback_seconds
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._deadline: Optional[float] = None
+        self._reported_deadline: Optional[float] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.slow_callbacks = 0
+
+    def percentiles(self) -> Dict[str, float]:
+        """
+        Lag percentiles over the recent sample window
+
+        Returns:
+            dict: p50/p90/p99/max lag in seconds (empty before any sample)
+        """
+        samples = sorted(self._samples)
+        if not samples:
+            return {}
+        result = {
+            f"p{int(q * 100)}": samples[min(len(samples) - 1, int(q * len(samples)))]
+            for q in LAG_QUANTILES
+        }
+        result["max"] = samples[-1]
+        return result
+
+    async def _sample(self):
+        """Sampler loop"""
+        while True:
+            self._deadline = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - self._deadline)
+            self._samples.append(lag)
+            event_loop_lag.observe(lag)
+
+    def _watch(self):
+        """Watchdog thread loop"""
+        poll = max(self.slow_callback_seconds / 2, 0.01)
+        while not self._stopping.wait(poll):
+            deadline = self._deadline
+            if deadline is None or deadline == self._reported_deadline:
+                continue
+
+            blocked = time.perf_counter() - deadline
+            if blocked < self.slow_callback_seconds:
+                continue
+
+            # Report each blocked interval once
+            self._reported_deadline = deadline
+            self.slow_callbacks += 1
+            event_loop_slow_callbacks.inc()
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "unavailable"
+            logger.warning(
+                "Event loop blocked for at least %.0fms, current stack:\n%s",
+                blocked * 1000,
+                stack,
+            )
+
+    def start(self):
+        """Start the sampler task and watchdog thread"""
+        if self._task is not None:
+            return
+
+        self._loop_thread_id = threading.get_ident()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-monitor", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self):
+        """Stop the sampler task and watchdog thread"""
+        self._stopping.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._deadline = None
+
+
+# Global loop monitor instance
+loop_monitor = LoopMonitor(
+    interval=settings.loop_monitor_interval_seconds,
+    slow_callback_seconds=settings.loop_monitor_slow_callback_seconds,
+    window=settings.loop_monitor_window,
+)
+
+registry.callback_gauge(
+    "event_loop_lag_quantile_seconds",
+    "Event loop scheduling delay percentiles over the recent sample window",
+    ("quantile",),
+    lambda: [((name,), value) for name, value in loop_monitor.percentiles().items()],
+)
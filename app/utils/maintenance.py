@@ -0,0 +1,248 @@
+from sqlalchemy import select, delete, update, text, and_, or_
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncConnection
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.database import engine
+from app.models import OAuthState, WebhookEvent
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key shared by every node running the sweeper
+MAINTENANCE_LOCK_KEY = 0x53484F50
+
+
+class MaintenanceSweeper:
+    """
+    Periodic maintenance task
+
+    Each run deletes expired OAuth states in bounded batches and re-runs
+    webhook events stuck at processed=False with bounded concurrency. A
+    transaction-scoped PostgreSQL advisory lock makes sure only one node
+    changes rows at a time, and requeued events are claimed in the database.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: int = 300,
+        batch_size: int = 1000,
+        max_batches: int = 50,
+        stale_after_seconds: int = 900,
+        state_ttl_seconds: int = 600,
+        requeue_concurrency: int = 4,
+    ):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.stale_after_seconds = stale_after_seconds
+        self.state_ttl_seconds = state_ttl_seconds
+        self.requeue_concurrency = requeue_concurrency
+        self.stats: Dict[str, Any] = {
+            "runs": 0,
+            "runs_skipped_locked": 0,
+            "runs_failed": 0,
+            "oauth_states_deleted": 0,
+            "webhook_events_requeued": 0,
+            "last_run_at": None,
+            "last_run_duration_seconds": None,
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    async def _try_lock(self, conn: AsyncConnection) -> bool:
+        """
+        Take the maintenance lock for the current transaction
+
+        The lock is transaction-scoped, so it is released by every commit or
+        rollback and can never stay behind on a pooled connection.
+        """
+        return await conn.scalar(
+            text("SELECT pg_try_advisory_xact_lock(:key)"),
+            {"key": MAINTENANCE_LOCK_KEY},
+        )
+
+    async def _delete_expired_states(self, conn: AsyncConnection) -> int:
+        """Delete expired OAuth states in bounded batches, one lock per batch"""
+        now = datetime.utcnow()
+        # States created before expires_at was set expire created_at + TTL
+        legacy_cutoff = now - timedelta(seconds=self.state_ttl_seconds)
+
+        expired_ids = (
+            select(OAuthState.id)
+            .where(
+                or_(
+                    OAuthState.expires_at < now,
+                    and_(
+                        OAuthState.expires_at.is_(None),
+                        OAuthState.created_at < legacy_cutoff,
+                    ),
+                )
+            )
+            .limit(self.batch_size)
+            .scalar_subquery()
+        )
+
+        deleted = 0
+        for _ in range(self.max_batches):
+            # Another node took over between batches
+            if not await self._try_lock(conn):
+                await conn.rollback()
+                break
+            result = await conn.execute(
+                delete(OAuthState).where(OAuthState.id.in_(expired_ids))
+            )
+            await conn.commit()
+            deleted += result.rowcount
+            if result.rowcount < self.batch_size:
+                break
+
+        return deleted
+
+    async def _claim_stale_events(self, conn: AsyncConnection) -> List[Row]:
+        """
+        Claim webhook events that were never processed
+
+        Claims are stored in requeued_at, so no other node requeues the same
+        events while they are being processed. A claim older than
+        `stale_after_seconds` (e.g. the worker died) can be taken again.
+        """
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.stale_after_seconds)
+        stale_ids = (
+            select(WebhookEvent.id)
+            .where(
+                WebhookEvent.processed == False,
+                WebhookEvent.error_message.is_(None),
+                WebhookEvent.received_at < cutoff,
+                or_(
+                    WebhookEvent.requeued_at.is_(None),
+                    WebhookEvent.requeued_at < cutoff,
+                ),
+            )
+            # Oldest first, read from ix_webhook_events_unprocessed
+            .order_by(WebhookEvent.received_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+
+        if not await self._try_lock(conn):
+            await conn.rollback()
+            return []
+        result = await conn.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id.in_(stale_ids))
+            .values(requeued_at=now)
+            .returning(
+                WebhookEvent.id,
+                WebhookEvent.topic,
+                WebhookEvent.shop_domain,
+                WebhookEvent.payload,
+            )
+        )
+        rows = result.all()
+        await conn.commit()
+        return rows
+
+    async def _process_events(self, rows: List[Row]) -> int:
+        """Run claimed events' handlers, at most `requeue_concurrency` at once"""
+        from app.routes.webhooks import process_webhook_event
+
+        semaphore = asyncio.Semaphore(self.requeue_concurrency)
+
+        async def process(event_id, topic, shop_domain, payload):
+            async with semaphore:
+                await process_webhook_event(event_id, topic, shop_domain, payload or {})
+
+        await asyncio.gather(*(process(*row) for row in rows))
+        return len(rows)
+
+    async def run_once(self) -> Optional[Dict[str, int]]:
+        """
+        Run one sweep if no other node holds the maintenance lock
+
+        Returns:
+            dict: What the sweep did, or None if the lock was held elsewhere
+        """
+        started = time.monotonic()
+
+        async with engine.connect() as conn:
+            locked = await self._try_lock(conn)
+            await conn.rollback()
+
+            if not locked:
+                self.stats["runs_skipped_locked"] += 1
+                return None
+
+            deleted = await self._delete_expired_states(conn)
+            claimed = await self._claim_stale_events(conn)
+
+        # Handlers use their own sessions; the sweep's connection is returned
+        requeued = await self._process_events(claimed)
+
+        self.stats["runs"] += 1
+        self.stats["oauth_states_deleted"] += deleted
+        self.stats["webhook_events_requeued"] += requeued
+        self.stats["last_run_at"] = datetime.utcnow()
+        self.stats["last_run_duration_seconds"] = round(
+            time.monotonic() - started, 3
+        )
+
+        logger.info(
+            "Maintenance sweep: deleted %d expired OAuth states, "
+            "requeued %d stale webhook events",
+            deleted,
+            requeued,
+        )
+        return {"oauth_states_deleted": deleted, "webhook_events_requeued": requeued}
+
+    async def _run(self):
+        """Sweep loop"""
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.stats["runs_failed"] += 1
+                logger.error("Maintenance sweep failed: %s", e)
+
+    def start(self):
+        """Start the periodic sweep task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the sweep task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global sweeper instance
+maintenance_sweeper = MaintenanceSweeper(
+    interval_seconds=settings.maintenance_interval_seconds,
+    batch_size=settings.maintenance_batch_size,
+    max_batches=settings.maintenance_max_batches,
+    stale_after_seconds=settings.webhook_stale_after_seconds,
+    state_ttl_seconds=settings.oauth_state_ttl_seconds,
+    requeue_concurrency=settings.maintenance_requeue_concurrency,
+)
+registry.callback_counter(
+    "maintenance_sweeper_total",
+    "Maintenance sweeper counters since startup",
+    ("counter",),
+    lambda: [
+        ((key,), value)
+        for key, value in maintenance_sweeper.stats.items()
+        if isinstance(value, int)
+    ],
+)
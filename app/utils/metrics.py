@@ -0,0 +1,371 @@
+from bisect import bisect_left
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import time
+
+# Metrics are updated from the event loop thread only, so plain dict and
+# float updates are safe without locks.
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+
+    metric_type = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Labels, object] = {}
+
+    def labels(self, *values: str):
+        """Get the child metric for a set of label values"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_dict(self, values: Labels) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter (name should end in _total)"""
+
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def samples(self) -> Iterable[Sample]:
+        for values, child in self._children.items():
+            yield self.name, self._label_dict(values), child.value
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    metric_type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def samples(self) -> Iterable[Sample]:
+        for values, child in self._children.items():
+            yield self.name, self._label_dict(values), child.value
+
+
+class CallbackGauge(_Metric):
+    """Gauge whose samples are read from a callback at scrape time"""
+
+    metric_type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], Iterable[Tuple[Labels, float]]],
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> Iterable[Sample]:
+        for values, value in self.callback():
+            yield self.name, self._label_dict(values), value
+
+
+class CallbackCounter(CallbackGauge):
+    """Counter whose samples are read from a callback at scrape time"""
+
+    metric_type = "counter"
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self) -> Iterable[Sample]:
+        for values, child in self._children.items():
+            labels = self._label_dict(values)
+            cumulative = 0
+            bounds = self.upper_bounds + (float("inf"),)
+            for bound, count in zip(bounds, child.counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    {**labels, "le": _format_value(bound)},
+                    cumulative,
+                )
+            yield f"{self.name}_sum", labels, child.sum
+            yield f"{self.name}_count", labels, child.count
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=None
+    ) -> Histogram:
+        return self.register(
+            Histogram(
+                name, documentation, labelnames, buckets or DEFAULT_LATENCY_BUCKETS
+            )
+        )
+
+    def callback_gauge(
+        self, name: str, documentation: str, labelnames, callback
+    ) -> CallbackGauge:
+        return self.register(CallbackGauge(name, documentation, labelnames, callback))
+
+    def callback_counter(
+        self, name: str, documentation: str, labelnames, callback
+    ) -> CallbackCounter:
+        return self.register(
+            CallbackCounter(name, documentation, labelnames, callback)
+        )
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            try:
+                for name, labels, value in metric.samples():
+                    lines.append(
+                        f"{name}{_format_labels(labels)} {_format_value(value)}"
+                    )
+            except Exception as e:
+                lines.append(f"# {metric.name} collection failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+# Global registry
+registry = MetricsRegistry()
+
+# HTTP
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled"
+)
+
+# Shopify API
+shopify_api_duration = registry.histogram(
+    "shopify_api_request_duration_seconds",
+    "Shopify API call latency",
+    ("shop", "api"),
+)
+shopify_api_requests = registry.counter(
+    "shopify_api_requests_total", "Shopify API calls", ("shop", "api", "status")
+)
+shopify_graphql_cost = registry.histogram(
+    "shopify_graphql_query_cost",
+    "Actual GraphQL query cost reported by Shopify",
+    ("shop",),
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+# Webhooks
+webhooks_received = registry.counter(
+    "webhooks_received_total", "Webhooks accepted and stored", ("topic",)
+)
+webhooks_rejected = registry.counter(
+    "webhooks_rejected_total", "Webhooks rejected before storage", ("reason",)
+)
+webhooks_processed = registry.counter(
+    "webhooks_processed_total", "Webhooks processed", ("topic", "outcome")
+)
+webhook_processing_lag = registry.histogram(
+    "webhook_processing_lag_seconds",
+    "Time from webhook receipt to processing completion",
+    ("topic",),
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600),
+)
+
+
+def _route_name(scope: Scope) -> str:
+    """Route template (e.g. /api/shops/{shop_domain}) to keep labels bounded"""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path or "unmatched"
+
+
+class MetricsMiddleware:
+    """Record per-route request counts, latency and in-flight requests"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+        http_requests_in_flight.inc()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = _route_name(scope)
+            method = scope["method"]
+            http_request_duration.labels(method, route).observe(
+                time.perf_counter() - started
+            )
+            http_requests.labels(method, route, str(status_code)).inc()
+
+
+def observe_shopify_call(
+    shop_domain: str,
+    api: str,
+    status: str,
+    duration: float,
+    cost: Optional[int] = None,
+):
+    """
+    Record one Shopify API call
+
+    Args:
+        shop_domain: Shop domain
+        api: 'graphql', 'rest' or 'oauth'
+        status: HTTP status code or 'error'
+        duration: Call duration in seconds
+        cost: Actual GraphQL query cost (optional)
+    """
+    shopify_api_duration.labels(shop_domain, api).observe(duration)
+    shopify_api_requests.labels(shop_domain, api, status).inc()
+    if cost is not None:
+        shopify_graphql_cost.labels(shop_domain).observe(cost)
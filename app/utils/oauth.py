@@ -1,8 +1,16 @@
 import secrets
+import hmac
+import hashlib
+import base64
+import time
+import logging
+from collections import OrderedDict
 from urllib.parse import urlencode
-from typing import List
+from typing import List, Optional
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 
 def generate_state() -> str:
     """
@@ -14,6 +22,131 @@ def generate_state() -> str:
     return secrets.token_urlsafe(32)
 
 
+class NonceCache:
+    """
+    In-memory replay-prevention set with TTL-based eviction
+
+    Nonces are kept until their expiry time and evicted in insertion order,
+    which matches expiry order because every state has the same TTL.
+    Unexpired nonces are never evicted: when the cache is full of them, new
+    states are rejected instead.
+
+    The cache is per worker, so with several workers a state can be replayed
+    once against each other worker. Use oauth_state_mode "database" where
+    that matters.
+    """
+
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    def _evict(self, now: float):
+        """Drop expired entries"""
+        while self._entries:
+            nonce, expires = next(iter(self._entries.items()))
+            if expires > now:
+                break
+            self._entries.popitem(last=False)
+
+    def add(self, nonce: str, expires: float) -> bool:
+        """
+        Record a nonce as used
+
+        Args:
+            nonce: State nonce
+            expires: Unix time after which the nonce can be forgotten
+
+        Returns:
+            bool: False if the nonce was already used, or the cache is full
+        """
+        now = time.time()
+        self._evict(now)
+        if nonce in self._entries:
+            return False
+        if len(self._entries) >= self.max_size:
+            logger.warning("OAuth state nonce cache full, rejecting state")
+            return False
+        self._entries[nonce] = expires
+        return True
+
+
+# Used state nonces for this worker
+used_state_nonces = NonceCache()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign_state(payload: bytes) -> bytes:
+    return hmac.new(
+        settings.secret_key.encode("utf-8"), payload, hashlib.sha256
+    ).digest()
+
+
+def create_signed_state(shop_domain: str, ttl_seconds: Optional[int] = None) -> str:
+    """
+    Create a stateless, HMAC-signed OAuth state
+
+    The token carries the shop domain, a random nonce and an expiry time,
+    so no database row is needed to verify it on callback.
+
+    Args:
+        shop_domain: Shop domain the state is issued for
+        ttl_seconds: Lifetime of the state (defaults to settings)
+
+    Returns:
+        str: Signed state token
+    """
+    if ttl_seconds is None:
+        ttl_seconds = settings.oauth_state_ttl_seconds
+
+    expires = int(time.time()) + ttl_seconds
+    nonce = secrets.token_urlsafe(16)
+    payload = f"{shop_domain}|{nonce}|{expires}".encode("utf-8")
+
+    return f"{_b64encode(payload)}.{_b64encode(_sign_state(payload))}"
+
+
+def verify_signed_state(state: str, shop_domain: str) -> bool:
+    """
+    Verify and consume a signed OAuth state
+
+    Args:
+        state: State token from the OAuth callback
+        shop_domain: Shop domain from the OAuth callback
+
+    Returns:
+        bool: True if the signature is valid, the state is unexpired, issued
+        for this shop and has not been used before
+    """
+    try:
+        encoded_payload, encoded_signature = state.split(".", 1)
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except (ValueError, TypeError):
+        return False
+
+    if not hmac.compare_digest(_sign_state(payload), signature):
+        return False
+
+    try:
+        state_shop, nonce, expires = payload.decode("utf-8").split("|")
+        expires = int(expires)
+    except ValueError:
+        return False
+
+    if state_shop != shop_domain or expires < time.time():
+        return False
+
+    # One-time use
+    return used_state_nonces.add(nonce, expires)
+
+
 def build_oauth_authorize_url(
     shop_domain: str, state: str, redirect_uri: str, scopes: List[str] = None
 ) -> str:
@@ -0,0 +1,115 @@
+import anyio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.sql import Select
+from typing import Any, AsyncIterator, Dict, Iterable, Sequence, Tuple
+
+
+def compile_copy_out(
+    engine: AsyncEngine, query: Select
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Render `COPY (query) TO STDOUT` as CSV with a header row
+
+    Args:
+        engine: Engine whose dialect the query is compiled for
+        query: SELECT to export
+
+    Returns:
+        tuple: (COPY statement with %(name)s placeholders, parameters).
+            COPY cannot take server-side parameters, so psycopg binds them
+            client-side.
+    """
+    compiled = query.compile(
+        dialect=engine.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    statement = f"COPY ({compiled}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+    return statement, compiled.params
+
+
+async def stream_copy_out(
+    engine: AsyncEngine,
+    query: Select,
+    chunk_size: int = 65536,
+    statement_timeout_ms: int = 0,
+) -> AsyncIterator[bytes]:
+    """
+    Stream a query's rows as CSV straight from PostgreSQL
+
+    Rows are never turned into Python objects: COPY output is passed through
+    in chunks of about `chunk_size` bytes. The next chunk is read only after
+    the previous one was consumed, so a slow client slows the COPY down
+    instead of buffering the export in memory.
+
+    Args:
+        engine: Engine to export from (usually the read engine)
+        query: SELECT to export
+        chunk_size: Bytes to collect before yielding (COPY sends one row per
+            message)
+        statement_timeout_ms: Statement timeout for the export (0 = none)
+
+    Yields:
+        bytes: CSV data, starting with the header row
+    """
+    statement, params = compile_copy_out(engine, query)
+    async with engine.connect() as conn:
+        # Also opens the transaction the COPY runs in
+        await conn.execute(
+            text(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}")
+        )
+        raw = await conn.get_raw_connection()
+        buffer = bytearray()
+        try:
+            async with raw.driver_connection.cursor() as cursor:
+                async with cursor.copy(statement, params) as copy:
+                    async for data in copy:
+                        buffer += data
+                        if len(buffer) >= chunk_size:
+                            yield bytes(buffer)
+                            buffer.clear()
+            if buffer:
+                yield bytes(buffer)
+        except BaseException:
+            # Client went away or the COPY failed part way: the connection
+            # may still be in COPY state, so do not return it to the pool.
+            # Shielded: a disconnect cancels the whole response task.
+            with anyio.CancelScope(shield=True):
+                await conn.invalidate()
+            raise
+        await conn.rollback()
+
+
+async def copy_rows_in(
+    conn: AsyncConnection,
+    table_name: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+) -> int:
+    """
+    Load rows into a table with `COPY ... FROM STDIN`
+
+    Runs on the connection's current transaction, so the rows are visible to
+    later statements on `conn` and roll back with it.
+
+    Args:
+        conn: Connection to copy on
+        table_name: Target table (e.g. a temporary staging table)
+        columns: Column names, in the order of each row's values
+        rows: Row values; dicts and lists must already be wrapped for JSON
+
+    Returns:
+        int: Number of rows copied
+    """
+    quote = conn.dialect.identifier_preparer.quote
+    statement = (
+        f"COPY {quote(table_name)} ({', '.join(quote(c) for c in columns)}) "
+        "FROM STDIN"
+    )
+    raw = await conn.get_raw_connection()
+    count = 0
+    async with raw.driver_connection.cursor() as cursor:
+        async with cursor.copy(statement) as copy:
+            for row in rows:
+                await copy.write_row(row)
+                count += 1
+    return count
@@ -0,0 +1,263 @@
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# (function, file, first line)
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+PROFILE_MODES = ("cpu", "await")
+PROFILE_FORMATS = ("collapsed", "speedscope")
+
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+_THREADING_FILE = threading.__file__
+_CWD = os.getcwd()
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(_CWD):
+        return os.path.relpath(filename, _CWD)
+    for path in sorted(sys.path, key=len, reverse=True):
+        if path and filename.startswith(path):
+            return os.path.relpath(filename, path)
+    return filename
+
+
+def _frame_key(code) -> Frame:
+    name = getattr(code, "co_qualname", code.co_name)
+    return (name, _short_path(code.co_filename), code.co_firstlineno)
+
+
+def _is_internal(filename: str) -> bool:
+    """Event loop plumbing that only adds noise between await chains"""
+    return filename.startswith(_ASYNCIO_DIR) or filename == _THREADING_FILE
+
+
+def thread_stack(frame) -> Stack:
+    """
+    Collapse a thread's frame chain, root first, without asyncio internals
+
+    Args:
+        frame: Innermost frame (from sys._current_frames())
+
+    Returns:
+        tuple: Frames from outermost to innermost
+    """
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        if not _is_internal(code.co_filename):
+            frames.append(_frame_key(code))
+        frame = frame.f_back
+    frames.reverse()
+    return tuple(frames)
+
+
+def task_stack(task: asyncio.Task) -> Stack:
+    """
+    Follow a suspended task's await chain from its root coroutine
+
+    Args:
+        task: asyncio task
+
+    Returns:
+        tuple: Coroutine frames from the task's root to the innermost await,
+            ending with the awaited object's type when it is not a coroutine
+    """
+    frames: List[Frame] = []
+    awaitable: Any = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(
+            awaitable, "gi_frame", None
+        )
+        if frame is None:
+            if not hasattr(awaitable, "cr_code"):
+                # Leaf future, e.g. a socket read or asyncio.sleep
+                frames.append((f"<{type(awaitable).__name__}>", "", 0))
+            break
+        frames.append(_frame_key(frame.f_code))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(
+            awaitable, "gi_yieldfrom", None
+        )
+    return tuple(frames)
+
+
+def sample_thread(
+    thread_id: int, duration: float, interval: float, stop: threading.Event
+) -> Counter:
+    """
+    Sample one thread's stack at a fixed interval (run in another thread)
+
+    Args:
+        thread_id: Thread to sample (the event loop thread)
+        duration: Seconds to sample for
+        interval: Seconds between samples
+        stop: Set to end sampling early
+
+    Returns:
+        Counter: Stack -> number of samples
+    """
+    stacks: Counter = Counter()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline and not stop.is_set():
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            stacks[thread_stack(frame)] += 1
+        del frame
+        time.sleep(interval)
+    return stacks
+
+
+async def sample_tasks(duration: float, interval: float) -> Counter:
+    """
+    Sample the await chains of all suspended tasks on the running loop
+
+    Args:
+        duration: Seconds to sample for
+        interval: Seconds between samples
+
+    Returns:
+        Counter: Stack -> number of samples
+    """
+    stacks: Counter = Counter()
+    current = asyncio.current_task()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for task in asyncio.all_tasks():
+            if task is not current and not task.done():
+                stacks[task_stack(task)] += 1
+        await asyncio.sleep(interval)
+    return stacks
+
+
+def to_collapsed(stacks: Counter) -> str:
+    """
+    Render stacks in the collapsed format used by flamegraph.pl and speedscope
+
+    Args:
+        stacks: Stack -> number of samples
+
+    Returns:
+        str: One 'frame;frame;frame count' line per stack
+    """
+    lines = []
+    for stack, count in stacks.most_common():
+        names = ";".join(
+            f"{name} ({filename}:{line})" if filename else name
+            for name, filename, line in stack
+        )
+        lines.append(f"{names or '<idle>'} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(
+    stacks: Counter, name: str, interval: float, duration: float
+) -> Dict[str, Any]:
+    """
+    Render stacks as a speedscope sampled profile
+
+    Args:
+        stacks: Stack -> number of samples
+        name: Profile name
+        interval: Seconds between samples (the weight of one sample)
+        duration: Profile duration in seconds
+
+    Returns:
+        dict: speedscope file contents
+    """
+    frame_index: Dict[Frame, int] = {}
+    frames = []
+    samples = []
+    weights = []
+    for stack, count in stacks.most_common():
+        indices = []
+        for frame in stack:
+            index = frame_index.get(frame)
+            if index is None:
+                index = frame_index[frame] = len(frames)
+                function, filename, line = frame
+                entry: Dict[str, Any] = {"name": function}
+                if filename:
+                    entry.update(file=filename, line=line)
+                frames.append(entry)
+            indices.append(index)
+        samples.append(indices)
+        weights.append(count * interval)
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": duration,
+                "samples": samples,
+                "weights": weights,
+            }
+        ],
+        "name": name,
+        "exporter": "shopify-fastapi-app",
+    }
+
+
+class Profiler:
+    """
+    On-demand statistical profiler for the current worker
+
+    'cpu' mode samples the event loop thread's stack from a helper thread,
+    so it shows what the loop is executing (including the active await
+    chain). 'await' mode samples every suspended task's await chain on the
+    loop itself, showing where requests spend wall-clock time waiting. Only
+    one profile runs at a time per worker.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    async def profile(
+        self, seconds: float, interval: float, mode: str = "cpu"
+    ) -> Counter:
+        """
+        Profile the running worker
+
+        Args:
+            seconds: How long to sample for
+            interval: Seconds between samples
+            mode: 'cpu' or 'await'
+
+        Returns:
+            Counter: Stack -> number of samples
+
+        Raises:
+            ValueError: If the mode is unknown
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+
+        async with self._lock:
+            if mode == "await":
+                return await sample_tasks(seconds, interval)
+
+            stop = threading.Event()
+            try:
+                return await asyncio.to_thread(
+                    sample_thread, threading.get_ident(), seconds, interval, stop
+                )
+            finally:
+                # Client disconnected or the request was cancelled
+                stop.set()
+
+
+# Global profiler instance
+profiler = Profiler()
@@ -0,0 +1,300 @@
+from collections import Counter, deque
+from contextvars import ContextVar
+from functools import lru_cache
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Any, Deque, Dict, List, Optional
+import logging
+import re
+import time
+
+from app.config import settings
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+OTHER_FINGERPRINT = "<other>"
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+|\?")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LISTS = re.compile(r"(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+", re.I)
+_WHITESPACE = re.compile(r"\s+")
+
+db_statements_per_request = registry.histogram(
+    "db_statements_per_request",
+    "SQL statements executed per request",
+    ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+db_time_per_request = registry.histogram(
+    "db_time_per_request_seconds",
+    "Time spent executing SQL per request",
+    ("route",),
+)
+db_budget_exceeded = registry.counter(
+    "db_statement_budget_exceeded_total",
+    "Requests that ran more statements than their budget",
+    ("route",),
+)
+db_n_plus_one = registry.counter(
+    "db_n_plus_one_total",
+    "Requests that repeated one statement fingerprint past the N+1 threshold",
+    ("route",),
+)
+db_slow_queries = registry.counter(
+    "db_slow_queries_total", "Statements slower than the slow-query threshold"
+)
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """
+    Normalize SQL so statements differing only in literals group together
+
+    Args:
+        statement: SQL text as sent to the driver
+
+    Returns:
+        str: Fingerprint with literals and parameters replaced by '?'
+    """
+    sql = _COMMENTS.sub(" ", statement)
+    sql = _STRINGS.sub("?", sql)
+    sql = _PLACEHOLDERS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _IN_LISTS.sub("(?+)", sql)
+    sql = _VALUES_LISTS.sub(r"\1, ...", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class FingerprintStats:
+    """Aggregate timings for one statement fingerprint"""
+
+    __slots__ = ("count", "total_time", "max_time", "rows")
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+
+    def add(self, duration: float, rows: int):
+        self.count += 1
+        self.total_time += duration
+        if duration > self.max_time:
+            self.max_time = duration
+        if rows > 0:
+            self.rows += rows
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_time * 1000, 3),
+            "mean_ms": round(self.total_time * 1000 / self.count, 3)
+            if self.count
+            else 0.0,
+            "max_ms": round(self.max_time * 1000, 3),
+            "rows": self.rows,
+        }
+
+
+class RequestQueries:
+    """Statements executed while handling one request"""
+
+    __slots__ = ("statements", "db_time", "fingerprints")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.fingerprints: Counter = Counter()
+
+
+_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar(
+    "request_queries", default=None
+)
+
+
+class QueryStatsCollector:
+    """
+    Statement statistics fed by engine events
+
+    Keeps global per-fingerprint stats (bounded to `max_fingerprints`; the
+    rest are grouped under '<other>') and per-request counts that are checked
+    against statement budgets and the N+1 threshold when the request ends.
+    """
+
+    def __init__(
+        self,
+        default_budget: int = 25,
+        route_budgets: Optional[Dict[str, int]] = None,
+        n_plus_one_threshold: int = 5,
+        slow_query_seconds: float = 0.2,
+        max_fingerprints: int = 1000,
+        flagged_history: int = 100,
+    ):
+        self.default_budget = default_budget
+        self.route_budgets = route_budgets or {}
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_query_seconds = slow_query_seconds
+        self.max_fingerprints = max_fingerprints
+        self.fingerprints: Dict[str, FingerprintStats] = {}
+        self.flagged: Deque[Dict[str, Any]] = deque(maxlen=flagged_history)
+
+    def record(self, statement: str, duration: float, rows: int):
+        """
+        Record one executed statement
+
+        Args:
+            statement: SQL text
+            duration: Execution time in seconds
+            rows: cursor.rowcount (-1 if unknown)
+        """
+        key = fingerprint(statement)
+        stats = self.fingerprints.get(key)
+        if stats is None:
+            if len(self.fingerprints) >= self.max_fingerprints:
+                key = OTHER_FINGERPRINT
+                stats = self.fingerprints.get(key)
+            if stats is None:
+                stats = self.fingerprints[key] = FingerprintStats()
+        stats.add(duration, rows)
+
+        if duration >= self.slow_query_seconds:
+            db_slow_queries.inc()
+            logger.warning("Slow query (%.0fms): %s", duration * 1000, key[:500])
+
+        request = _request_queries.get()
+        if request is not None:
+            request.statements += 1
+            request.db_time += duration
+            request.fingerprints[key] += 1
+
+    def observe_statement(
+        self,
+        statement: str,
+        start: float,
+        end: float,
+        rows: int,
+        error: Optional[str] = None,
+    ):
+        """Record a successful statement (app.utils.statement_timing observer)"""
+        if error is None:
+            self.record(statement, end - start, rows)
+
+    def finish_request(self, route: str, request: RequestQueries):
+        """Export per-route metrics and flag budget or N+1 violations"""
+        db_statements_per_request.labels(route).observe(request.statements)
+        db_time_per_request.labels(route).observe(request.db_time)
+
+        budget = self.route_budgets.get(route, self.default_budget)
+        repeated = [
+            (key, count)
+            for key, count in request.fingerprints.most_common(3)
+            if count >= self.n_plus_one_threshold
+        ]
+        over_budget = request.statements > budget
+        if not over_budget and not repeated:
+            return
+
+        if over_budget:
+            db_budget_exceeded.labels(route).inc()
+        if repeated:
+            db_n_plus_one.labels(route).inc()
+
+        self.flagged.append(
+            {
+                "route": route,
+                "at": time.time(),
+                "statements": request.statements,
+                "budget": budget,
+                "db_ms": round(request.db_time * 1000, 3),
+                "repeated": [
+                    {"fingerprint": key, "count": count} for key, count in repeated
+                ],
+            }
+        )
+        logger.warning(
+            "Query budget check failed for %s: %d statements (budget %d)%s",
+            route,
+            request.statements,
+            budget,
+            (
+                f", repeated {repeated[0][1]}x: {repeated[0][0][:200]}"
+                if repeated
+                else ""
+            ),
+        )
+
+    def top(self, limit: int = 20, order_by: str = "total_ms") -> List[Dict]:
+        """
+        Top fingerprints by total time, count or max time
+
+        Args:
+            limit: Number of fingerprints to return
+            order_by: 'total_ms', 'count', 'mean_ms' or 'max_ms'
+
+        Returns:
+            list: Fingerprint stats, highest first
+        """
+        entries = [
+            {"fingerprint": key, **stats.to_dict()}
+            for key, stats in self.fingerprints.items()
+        ]
+        entries.sort(key=lambda entry: entry[order_by], reverse=True)
+        return entries[:limit]
+
+    def reset(self):
+        """Clear all collected statistics"""
+        self.fingerprints.clear()
+        self.flagged.clear()
+
+
+class QueryStatsMiddleware:
+    """Collect the statements each request runs and check them at the end"""
+
+    def __init__(self, app: ASGIApp, collector: "QueryStatsCollector"):
+        self.app = app
+        self.collector = collector
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestQueries()
+        token = _request_queries.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_queries.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.collector.finish_request(f"{scope['method']} {route}", request)
+
+
+def parse_route_budgets(value: str) -> Dict[str, int]:
+    """
+    Parse 'GET /api/products=6,PUT /api/shops/{shop_domain}/settings=3'
+
+    Args:
+        value: Comma-separated route=budget pairs
+
+    Returns:
+        dict: Route -> statement budget
+    """
+    budgets = {}
+    for item in value.split(","):
+        route, _, budget = item.rpartition("=")
+        if route.strip() and budget.strip().isdigit():
+            budgets[route.strip()] = int(budget)
+    return budgets
+
+
+# Global collector instance
+query_stats = QueryStatsCollector(
+    default_budget=settings.query_budget_per_request,
+    route_budgets=parse_route_budgets(settings.query_route_budgets),
+    n_plus_one_threshold=settings.query_n_plus_one_threshold,
+    slow_query_seconds=settings.slow_query_ms / 1000,
+    max_fingerprints=settings.query_stats_max_fingerprints,
+)
@@ -0,0 +1,264 @@
+from sqlalchemy import select, update, func, desc, case, cast, literal, Text
+from sqlalchemy.dialects.postgresql import JSONB, array
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.orm import defer
+from sqlalchemy.sql import ColumnElement, Select, Update
+from datetime import datetime
+from typing import Any, Dict, Optional, Union
+
+from app.models import Shop, ShopUsage, WebhookEvent
+
+# Columns needed to render a row of the admin shop listing.
+# Selecting columns (instead of the Shop entity) returns plain Row tuples that
+# are not tracked by the session identity map.
+SHOP_LIST_COLUMNS = (
+    Shop.id,
+    Shop.shop_domain,
+    Shop.shop_name,
+    Shop.country_code,
+    Shop.country_name,
+    Shop.currency,
+    Shop.plan_name,
+    Shop.plan_display_name,
+    Shop.uninstalled,
+    Shop.installed_at,
+    Shop.last_seen_at,
+    Shop.uninstalled_at,
+    Shop.subscription_status,
+    Shop.scopes,
+)
+
+# Columns needed to call the Shopify API on behalf of a shop
+SHOP_CREDENTIAL_COLUMNS = (Shop.shop_domain, Shop.shop_name, Shop.access_token)
+
+
+def apply_shop_filters(
+    query: Select,
+    status: Optional[str] = None,
+    country: Optional[str] = None,
+    plan: Optional[str] = None,
+) -> Select:
+    """
+    Apply the admin listing filters to a Shop query
+
+    Args:
+        query: Query selecting from the shops table
+        status: 'active', 'uninstalled' or 'all'
+        country: Country code filter (optional)
+        plan: Plan name filter (optional)
+
+    Returns:
+        Select: Filtered query
+    """
+    if status == "active":
+        query = query.where(Shop.uninstalled == False)
+    elif status == "uninstalled":
+        query = query.where(Shop.uninstalled == True)
+    # For "all", don't filter by uninstalled status
+
+    if country:
+        query = query.where(Shop.country_code == country.upper())
+    if plan:
+        query = query.where(Shop.plan_name == plan.lower())
+
+    return query
+
+
+def shop_list_query(
+    status: Optional[str] = None,
+    country: Optional[str] = None,
+    plan: Optional[str] = None,
+) -> Select:
+    """Slim projection of shops for admin listings, newest installs first"""
+    query = apply_shop_filters(select(*SHOP_LIST_COLUMNS), status, country, plan)
+    return query.order_by(desc(Shop.installed_at))
+
+
+def shop_count_query(
+    status: Optional[str] = None,
+    country: Optional[str] = None,
+    plan: Optional[str] = None,
+) -> Select:
+    """Count of shops matching the admin listing filters"""
+    return apply_shop_filters(select(func.count(Shop.id)), status, country, plan)
+
+
+def shop_credentials_query() -> Select:
+    """Slim projection of installed shops with their access tokens"""
+    return select(*SHOP_CREDENTIAL_COLUMNS).where(Shop.uninstalled == False)
+
+
+def shop_detail_query() -> Select:
+    """
+    Shop entity query for detail views
+
+    The access token is deferred so it is never loaded into detail responses.
+    """
+    return select(Shop).options(defer(Shop.access_token))
+
+
+def shop_version_query(shop_domain: str) -> Select:
+    """
+    Version markers of a shop's detail view
+
+    Returns the shop's update timestamps and settings version together with
+    the newest usage and webhook ids, which change whenever the detail
+    response would change. Each max(id) is one probe of a (shop_domain, id)
+    index.
+    """
+    latest_usage = (
+        select(func.max(ShopUsage.id))
+        .where(ShopUsage.shop_domain == shop_domain)
+        .scalar_subquery()
+    )
+    latest_webhook = (
+        select(func.max(WebhookEvent.id))
+        .where(WebhookEvent.shop_domain == shop_domain)
+        .scalar_subquery()
+    )
+    return select(
+        Shop.updated_at,
+        Shop.last_seen_at,
+        Shop.settings_version,
+        latest_usage,
+        latest_webhook,
+    ).where(Shop.shop_domain == shop_domain)
+
+
+async def get_shop_credentials(
+    session: Union[AsyncSession, AsyncConnection], shop_domain: str
+) -> Optional[Row]:
+    """
+    Look up the credentials of an installed shop
+
+    Args:
+        session: Database session or connection
+        shop_domain: Shop domain
+
+    Returns:
+        Row: (shop_domain, shop_name, access_token) or None if not installed
+    """
+    result = await session.execute(
+        shop_credentials_query().where(Shop.shop_domain == shop_domain)
+    )
+    return result.one_or_none()
+
+
+def serialize_shop_row(shop: Row) -> dict:
+    """
+    Convert a SHOP_LIST_COLUMNS row to the admin listing format
+
+    Args:
+        shop: Row selected with SHOP_LIST_COLUMNS
+
+    Returns:
+        dict: Shop listing entry
+    """
+    return {
+        "id": shop.id,
+        "shop_domain": shop.shop_domain,
+        "shop_name": shop.shop_name,
+        "country": shop.country_code,
+        "country_name": shop.country_name,
+        "currency": shop.currency,
+        "plan": {
+            "name": shop.plan_name,
+            "display_name": shop.plan_display_name,
+        },
+        "status": "uninstalled" if shop.uninstalled else "active",
+        "installed_at": shop.installed_at,
+        "last_seen_at": shop.last_seen_at,
+        "uninstalled_at": shop.uninstalled_at,
+        "subscription_status": shop.subscription_status,
+        "scopes": shop.scopes.split(",") if shop.scopes else [],
+    }
+
+
+def _jsonb(value: Any) -> ColumnElement:
+    """Bind a Python value as a JSONB literal"""
+    return cast(literal(value, JSONB), JSONB)
+
+
+def build_settings_merge(
+    patch: Dict[str, Any], deep: bool = False
+) -> ColumnElement:
+    """
+    Build a server-side JSONB merge of a settings patch into app_settings
+
+    The shallow merge is `coalesce(app_settings, '{}') || patch`. With deep
+    merge, top-level keys whose patch value is an object are merged one level
+    down with jsonb_set instead of being replaced.
+
+    Args:
+        patch: Settings to merge
+        deep: Merge nested objects per key instead of replacing them
+
+    Returns:
+        ColumnElement: JSONB expression for the merged settings
+    """
+    current = func.coalesce(Shop.app_settings, _jsonb({}))
+
+    if not deep:
+        return current.op("||", return_type=JSONB)(_jsonb(patch))
+
+    nested = {k: v for k, v in patch.items() if isinstance(v, dict)}
+    flat = {k: v for k, v in patch.items() if k not in nested}
+
+    merged = current.op("||", return_type=JSONB)(_jsonb(flat))
+    for key, value in nested.items():
+        existing = current.op("->", return_type=JSONB)(literal(key, Text))
+        merged_value = case(
+            (
+                func.jsonb_typeof(existing) == "object",
+                existing.op("||", return_type=JSONB)(_jsonb(value)),
+            ),
+            else_=_jsonb(value),
+        )
+        merged = func.jsonb_set(
+            merged, array([literal(key, Text)]), merged_value, True, type_=JSONB
+        )
+
+    return merged
+
+
+def settings_update_statement(
+    shop_domain: str,
+    patch: Dict[str, Any],
+    deep: bool = False,
+    expected_version: Optional[int] = None,
+) -> Update:
+    """
+    Atomic settings update for an installed shop
+
+    Merges the patch in the database, bumps settings_version and returns the
+    merged settings in a single round trip. When expected_version is given the
+    update only applies if the stored version still matches.
+
+    Args:
+        shop_domain: Shop domain
+        patch: Settings to merge
+        deep: Merge nested objects per key
+        expected_version: Optimistic concurrency check (optional)
+
+    Returns:
+        Update: UPDATE ... RETURNING app_settings, settings_version
+    """
+    now = datetime.utcnow()
+    stmt = (
+        update(Shop)
+        .where(Shop.shop_domain == shop_domain, Shop.uninstalled == False)
+        .values(
+            app_settings=build_settings_merge(patch, deep),
+            settings_version=Shop.settings_version + 1,
+            last_seen_at=now,
+            updated_at=now,
+        )
+        .returning(Shop.app_settings, Shop.settings_version)
+        .execution_options(synchronize_session=False)
+    )
+
+    if expected_version is not None:
+        stmt = stmt.where(Shop.settings_version == expected_version)
+
+    return stmt
@@ -3,12 +3,73 @@ from typing import Dict, Any, Optional
 from fastapi import HTTPException
 import asyncio
 import logging
+import re
+import time
+
+from app.utils.json_codec import dumps, loads
+from app.utils.metrics import observe_shopify_call
+from app.utils.tracing import record_span
 
 logger = logging.getLogger(__name__)
 
+# Locates the query cost in a GraphQL response without parsing it
+GRAPHQL_COST_PATTERN = re.compile(rb'"actualQueryCost"\s*:\s*(\d+)')
+
+
+def _graphql_cost(content: bytes) -> Optional[int]:
+    """Extract extensions.cost.actualQueryCost from a raw GraphQL response"""
+    match = GRAPHQL_COST_PATTERN.search(content)
+    return int(match.group(1)) if match else None
+
 # API version to use
 API_VERSION = "2023-10"
 
+# Products listing query, shared by the parsed and raw variants
+PRODUCTS_QUERY = """
+query getProducts($first: Int!) {
+    products(first: $first) {
+        edges {
+            node {
+                id
+                title
+                status
+                totalInventory
+                vendor
+                productType
+                createdAt
+                updatedAt
+                images(first: 1) {
+                    edges {
+                        node {
+                            id
+                            url
+                            altText
+                        }
+                    }
+                }
+                variants(first: 5) {
+                    edges {
+                        node {
+                            id
+                            title
+                            price
+                            sku
+                            inventoryQuantity
+                        }
+                    }
+                }
+            }
+        }
+        pageInfo {
+            hasNextPage
+            hasPreviousPage
+            startCursor
+            endCursor
+        }
+    }
+}
+"""
+
 
 class ShopifyAPI:
     """Shopify API client for REST and GraphQL requests"""
@@ -31,6 +92,28 @@ class ShopifyAPI:
         Returns:
             dict: GraphQL response data
 
+        Raises:
+            HTTPException: If request fails
+        """
+        return loads(await self.graphql_request_raw(query, variables))
+
+    async def graphql_request_raw(
+        self, query: str, variables: Optional[Dict] = None
+    ) -> bytes:
+        """
+        Make a GraphQL request to Shopify and return the undecoded body
+
+        The body is only parsed if a cheap byte scan finds an "errors" key,
+        so successful responses can be passed through without a JSON
+        decode/encode round trip.
+
+        Args:
+            query: GraphQL query string
+            variables: Query variables (optional)
+
+        Returns:
+            bytes: Raw JSON response body
+
         Raises:
             HTTPException: If request fails
         """
@@ -44,33 +127,56 @@ class ShopifyAPI:
         if variables:
             payload["variables"] = variables
 
+        started = time.perf_counter()
+        status_label = "error"
+        cost = None
+
         async with httpx.AsyncClient(timeout=30.0) as client:
             try:
-                response = await client.post(url, json=payload, headers=headers)
+                response = await client.post(
+                    url, content=dumps(payload), headers=headers
+                )
+                status_label = str(response.status_code)
                 response.raise_for_status()
 
-                data = response.json()
+                content = response.content
+                cost = _graphql_cost(content)
 
-                # Check for GraphQL errors
-                if "errors" in data:
-                    logger.error(f"GraphQL errors: {data['errors']}")
-                    raise HTTPException(
-                        status_code=400, detail=f"GraphQL errors: {data['errors']}"
-                    )
+                # Check for GraphQL errors (parse only if the key may be present)
+                if b'"errors"' in content:
+                    data = loads(content)
+                    if "errors" in data:
+                        logger.error("GraphQL errors: %s", data["errors"])
+                        raise HTTPException(
+                            status_code=400, detail=f"GraphQL errors: {data['errors']}"
+                        )
 
-                return data
+                return content
 
             except httpx.RequestError as e:
-                logger.error(f"Request error: {e}")
+                logger.error("Request error: %s", e)
                 raise HTTPException(status_code=500, detail=f"Request failed: {e}")
             except httpx.HTTPStatusError as e:
                 logger.error(
-                    f"HTTP error: {e.response.status_code} - {e.response.text}"
+                    "HTTP error: %s - %s", e.response.status_code, e.response.text
                 )
                 raise HTTPException(
                     status_code=e.response.status_code,
                     detail=f"Shopify API error: {e.response.text}",
                 )
+            finally:
+                finished = time.perf_counter()
+                observe_shopify_call(
+                    self.shop_domain, "graphql", status_label, finished - started, cost
+                )
+                record_span(
+                    "shopify.graphql",
+                    started,
+                    finished,
+                    shop=self.shop_domain,
+                    status=status_label,
+                    cost=cost,
+                )
 
     async def rest_request(
         self,
@@ -100,42 +206,61 @@ class ShopifyAPI:
             "Content-Type": "application/json",
         }
 
+        content = dumps(data) if data is not None else None
+        started = time.perf_counter()
+        status_label = "error"
+
         async with httpx.AsyncClient(timeout=30.0) as client:
             try:
                 if method.upper() == "GET":
                     response = await client.get(url, headers=headers, params=params)
                 elif method.upper() == "POST":
                     response = await client.post(
-                        url, headers=headers, json=data, params=params
+                        url, headers=headers, content=content, params=params
                     )
                 elif method.upper() == "PUT":
                     response = await client.put(
-                        url, headers=headers, json=data, params=params
+                        url, headers=headers, content=content, params=params
                     )
                 elif method.upper() == "DELETE":
                     response = await client.delete(url, headers=headers, params=params)
                 else:
                     raise ValueError(f"Unsupported HTTP method: {method}")
 
+                status_label = str(response.status_code)
                 response.raise_for_status()
 
                 # Handle empty responses
                 if response.status_code == 204 or not response.content:
                     return {}
 
-                return response.json()
+                return loads(response.content)
 
             except httpx.RequestError as e:
-                logger.error(f"Request error: {e}")
+                logger.error("Request error: %s", e)
                 raise HTTPException(status_code=500, detail=f"Request failed: {e}")
             except httpx.HTTPStatusError as e:
                 logger.error(
-                    f"HTTP error: {e.response.status_code} - {e.response.text}"
+                    "HTTP error: %s - %s", e.response.status_code, e.response.text
                 )
                 raise HTTPException(
                     status_code=e.response.status_code,
                     detail=f"Shopify API error: {e.response.text}",
                 )
+            finally:
+                finished = time.perf_counter()
+                observe_shopify_call(
+                    self.shop_domain, "rest", status_label, finished - started
+                )
+                record_span(
+                    "shopify.rest",
+                    started,
+                    finished,
+                    shop=self.shop_domain,
+                    method=method.upper(),
+                    endpoint=endpoint,
+                    status=status_label,
+                )
 
     async def get_shop_info(self) -> Dict[str, Any]:
         """Get shop information"""
@@ -147,51 +272,11 @@ class ShopifyAPI:
 
     async def get_products_graphql(self, limit: int = 50) -> Dict[str, Any]:
         """Get products via GraphQL"""
-        query = """
-        query getProducts($first: Int!) {
-            products(first: $first) {
-                edges {
-                    node {
-                        id
-                        title
-                        status
-                        totalInventory
-                        vendor
-                        productType
-                        createdAt
-                        updatedAt
-                        images(first: 1) {
-                            edges {
-                                node {
-                                    id
-                                    url
-                                    altText
-                                }
-                            }
-                        }
-                        variants(first: 5) {
-                            edges {
-                                node {
-                                    id
-                                    title
-                                    price
-                                    sku
-                                    inventoryQuantity
-                                }
-                            }
-                        }
-                    }
-                }
-                pageInfo {
-                    hasNextPage
-                    hasPreviousPage
-                    startCursor
-                    endCursor
-                }
-            }
-        }
-        """
-        return await self.graphql_request(query, {"first": limit})
+        return await self.graphql_request(PRODUCTS_QUERY, {"first": limit})
+
+    async def get_products_graphql_raw(self, limit: int = 50) -> bytes:
+        """Get products via GraphQL as the raw JSON response body"""
+        return await self.graphql_request_raw(PRODUCTS_QUERY, {"first": limit})
 
 
 # Convenience functions for backward compatibility
@@ -241,16 +326,22 @@ async def exchange_code_for_token(shop_domain: str, code: str) -> Dict[str, Any]
 
     async with httpx.AsyncClient(timeout=30.0) as client:
         try:
-            response = await client.post(url, json=payload)
+            response = await client.post(
+                url,
+                content=dumps(payload),
+                headers={"Content-Type": "application/json"},
+            )
             response.raise_for_status()
-            return response.json()
+            return loads(response.content)
 
         except httpx.RequestError as e:
-            logger.error(f"Token exchange request error: {e}")
+            logger.error("Token exchange request error: %s", e)
             raise HTTPException(status_code=500, detail=f"Token exchange failed: {e}")
         except httpx.HTTPStatusError as e:
             logger.error(
-                f"Token exchange HTTP error: {e.response.status_code} - {e.response.text}"
+                "Token exchange HTTP error: %s - %s",
+                e.response.status_code,
+                e.response.text,
             )
             raise HTTPException(
                 status_code=e.response.status_code,
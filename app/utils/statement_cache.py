@@ -0,0 +1,71 @@
+from sqlalchemy import insert
+import logging
+import time
+
+from app.database import async_session_maker, engine
+from app.models import Shop, ShopUsage, WebhookEvent
+from app.utils.shop_queries import (
+    shop_credentials_query,
+    shop_detail_query,
+    shop_version_query,
+)
+
+logger = logging.getLogger(__name__)
+
+# Never a valid *.myshopify.com domain, so it cannot collide with a real shop
+WARMUP_SHOP_DOMAIN = "statement-cache-warmup.invalid"
+
+# Columns set by webhooks.process_webhook_event
+WEBHOOK_EVENT_INSERT_COLUMNS = (
+    "shop_domain",
+    "topic",
+    "webhook_id",
+    "payload",
+    "headers",
+    "processed",
+    "received_at",
+)
+
+# Row shape of UsageWriter.record
+SHOP_USAGE_INSERT_COLUMNS = (
+    "shop_domain",
+    "metric_name",
+    "metric_value",
+    "metric_data",
+    "date",
+)
+
+
+async def warm_statement_cache() -> float:
+    """
+    Warm the hot query shapes before the first request
+
+    The shop lookups by domain are executed once (SELECTs only), so
+    SQLAlchemy's compiled cache holds them. The webhook and usage inserts
+    are compiled for the engine's dialect but never executed: nothing is
+    written, no sequence values are used and a read-only role works.
+
+    Returns:
+        float: Seconds taken
+    """
+    started = time.perf_counter()
+    async with async_session_maker() as session:
+        try:
+            for query in (
+                shop_credentials_query().where(Shop.shop_domain == WARMUP_SHOP_DOMAIN),
+                shop_detail_query().where(Shop.shop_domain == WARMUP_SHOP_DOMAIN),
+                shop_version_query(WARMUP_SHOP_DOMAIN),
+            ):
+                await session.execute(query)
+        finally:
+            await session.rollback()
+
+    for model, columns in (
+        (WebhookEvent, WEBHOOK_EVENT_INSERT_COLUMNS),
+        (ShopUsage, SHOP_USAGE_INSERT_COLUMNS),
+    ):
+        insert(model).compile(dialect=engine.dialect, column_keys=list(columns))
+
+    elapsed = time.perf_counter() - started
+    logger.info("Statement cache warmed in %.1fms", elapsed * 1000)
+    return elapsed
@@ -0,0 +1,50 @@
+from typing import Callable, Optional, Sequence
+import time
+
+# observer(statement, start, end, rows, error): start/end are
+# time.perf_counter() values, rows is cursor.rowcount (-1 if unknown) and
+# error is the exception class name when the statement failed
+StatementObserver = Callable[[str, float, float, int, Optional[str]], None]
+
+
+def instrument_engine(engine, observers: Sequence[StatementObserver]):
+    """
+    Time every statement executed on an engine once and report it to observers
+
+    One listener pair per engine, however many consumers (tracing, query
+    statistics) need statement timings.
+
+    Args:
+        engine: SQLAlchemy AsyncEngine or Engine
+        observers: Called after each statement, in order
+    """
+    from sqlalchemy import event
+
+    if not observers:
+        return
+    observers = tuple(observers)
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("statement_start")
+        if not starts:
+            return
+        start, end = starts.pop(), time.perf_counter()
+        for observer in observers:
+            observer(statement, start, end, cursor.rowcount, None)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("statement_start") if conn is not None else None
+        if not starts:
+            return
+        start, end = starts.pop(), time.perf_counter()
+        error = type(exception_context.original_exception).__name__
+        for observer in observers:
+            observer(exception_context.statement or "", start, end, -1, error)
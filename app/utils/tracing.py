@@ -0,0 +1,332 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+from app.config import settings
+from app.utils.json_codec import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__(
+        self,
+        name: str,
+        span_id: int,
+        parent_id: Optional[int],
+        start: float,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start = start
+        self.end: Optional[float] = None
+        self.attributes = attributes or {}
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class Trace:
+    """All spans recorded for one request"""
+
+    def __init__(self, name: str):
+        self.trace_id = os.urandom(8).hex()
+        self.name = name
+        self.started_at = time.time()
+        self.spans: List[Span] = []
+        self._next_id = 0
+        self.root = self.start_span(name, None)
+
+    def start_span(
+        self,
+        name: str,
+        parent_id: Optional[int],
+        start: Optional[float] = None,
+        **attributes,
+    ) -> Span:
+        self._next_id += 1
+        span = Span(
+            name,
+            self._next_id,
+            parent_id,
+            time.perf_counter() if start is None else start,
+            attributes,
+        )
+        self.spans.append(span)
+        return span
+
+    def stage_totals(self) -> Dict[str, List[float]]:
+        """
+        Total time and count per stage (the span name prefix before the dot)
+
+        Returns:
+            dict: stage -> [total seconds, span count]
+        """
+        totals: Dict[str, List[float]] = {}
+        for span in self.spans:
+            if span is self.root or span.end is None:
+                continue
+            stage = span.name.split(".", 1)[0]
+            total = totals.setdefault(stage, [0.0, 0])
+            total[0] += span.end - span.start
+            total[1] += 1
+        return totals
+
+    def server_timing(self) -> str:
+        """Build a Server-Timing header value from the spans finished so far"""
+        entries = [
+            f'{stage};dur={total * 1000:.1f};desc="{count}"'
+            for stage, (total, count) in self.stage_totals().items()
+        ]
+        entries.append(f"total;dur={self.root.duration * 1000:.1f}")
+        entries.append(f'trace;desc="{self.trace_id}"')
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        origin = self.root.start
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.root.duration * 1000, 3),
+            "spans": [
+                {
+                    "id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "name": span.name,
+                    "offset_ms": round((span.start - origin) * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3),
+                    "attributes": span.attributes,
+                }
+                for span in self.spans
+            ],
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    """Get the sampled trace for the current request, if any"""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Time a block as a child of the current span
+
+    Does nothing (and yields None) when the current request is not sampled.
+
+    Args:
+        name: Span name, prefixed with its stage (e.g. 'webhook.store')
+        attributes: Extra attributes recorded with the span
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    new_span = trace.start_span(name, parent.span_id if parent else None, **attributes)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    finally:
+        new_span.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def record_span(name: str, start: float, end: float, **attributes):
+    """
+    Record an already finished operation as a child of the current span
+
+    Args:
+        name: Span name, prefixed with its stage (e.g. 'db.query')
+        start: time.perf_counter() at the start
+        end: time.perf_counter() at the end
+        attributes: Extra attributes recorded with the span
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    finished = trace.start_span(
+        name, parent.span_id if parent else None, start, **attributes
+    )
+    finished.end = end
+
+
+class RingBufferSink:
+    """Keep the most recent traces in memory"""
+
+    def __init__(self, capacity: int = 200):
+        self._traces: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.capacity = capacity
+
+    def export(self, trace: Trace):
+        self._traces[trace.trace_id] = trace.to_dict()
+        while len(self._traces) > self.capacity:
+            self._traces.popitem(last=False)
+
+    def recent(self, limit: int = 50, min_duration_ms: float = 0.0) -> List[Dict]:
+        """Most recent traces first, without their spans"""
+        summaries = []
+        for trace in reversed(self._traces.values()):
+            if trace["duration_ms"] < min_duration_ms:
+                continue
+            summaries.append(
+                {
+                    "trace_id": trace["trace_id"],
+                    "name": trace["name"],
+                    "started_at": trace["started_at"],
+                    "duration_ms": trace["duration_ms"],
+                    "span_count": len(trace["spans"]),
+                }
+            )
+            if len(summaries) >= limit:
+                break
+        return summaries
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        return self._traces.get(trace_id)
+
+
+class FileSink:
+    """Append traces as JSON lines from a background writer thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[bytes]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._write, name="trace-writer", daemon=True
+        )
+        self._thread.start()
+
+    def export(self, trace: Trace):
+        self._queue.put(dumps(trace.to_dict()) + b"\n")
+
+    def _write(self):
+        with open(self.path, "ab") as trace_file:
+            while True:
+                line = self._queue.get()
+                if line is None:
+                    return
+                trace_file.write(line)
+                if self._queue.empty():
+                    trace_file.flush()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=1.0)
+
+
+class Tracer:
+    """Sampling decisions and trace export"""
+
+    def __init__(self, sample_rate: float = 0.01, sinks: Sequence[Any] = ()):
+        self.sample_rate = sample_rate
+        self.sinks = list(sinks)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def export(self, trace: Trace):
+        for sink in self.sinks:
+            try:
+                sink.export(trace)
+            except Exception as e:
+                logger.warning("Trace sink %s failed: %s", type(sink).__name__, e)
+
+
+class TracingMiddleware:
+    """
+    Open a trace for sampled requests and report a Server-Timing header
+
+    The header aggregates the spans finished before the response starts
+    (db, shopify, webhook, ...) plus the total; the full trace, including
+    background tasks run after the response, is exported when the request
+    completes.
+    """
+
+    def __init__(
+        self, app: ASGIApp, tracer: "Tracer", excluded_paths: Sequence[str] = ()
+    ):
+        self.app = app
+        self.tracer = tracer
+        self.excluded_paths = tuple(excluded_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or scope["path"].startswith(self.excluded_paths)
+            or not self.tracer.should_sample()
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(trace.root)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                trace.root.attributes["status"] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", trace.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            trace.root.end = time.perf_counter()
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                trace.name = trace.root.name = f"{scope['method']} {route}"
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            self.tracer.export(trace)
+
+
+def observe_statement(
+    statement: str, start: float, end: float, rows: int, error: Optional[str] = None
+):
+    """
+    Record a 'db.query' span for a statement in a sampled request
+
+    Fed by app.utils.statement_timing.instrument_engine.
+    """
+    if _current_trace.get() is None:
+        return
+    if error is None:
+        record_span("db.query", start, end, statement=statement[:200], rows=rows)
+    else:
+        record_span("db.query", start, end, statement=statement[:200], error=error)
+
+
+# Global tracer instance
+tracer = Tracer(sample_rate=settings.tracing_sample_rate)
+trace_buffer = RingBufferSink(settings.tracing_buffer_size)
+tracer.add_sink(trace_buffer)
+if settings.tracing_file_path:
+    tracer.add_sink(FileSink(settings.tracing_file_path))
@@ -0,0 +1,166 @@
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+
+from app.config import settings
+from app.database import engine
+from app.models import ShopUsage
+
+logger = logging.getLogger(__name__)
+
+
+class UsageWriter:
+    """
+    Write-behind buffer for ShopUsage rows
+
+    Request handlers record usage in memory; a background task inserts the
+    buffered rows with one multi-row INSERT per batch, so handlers never wait
+    on (or hold) a database connection to track usage. If the database is
+    unavailable the buffer keeps at most `max_pending` rows and drops the
+    oldest beyond that. Rows the database rejects (e.g. for a shop that was
+    deleted) are dropped on their own, so they cannot block later flushes.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 5.0,
+        batch_size: int = 500,
+        max_pending: int = 10000,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.rejected = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def record(
+        self,
+        shop_domain: str,
+        metric_name: str,
+        metric_value: int = 1,
+        metric_data: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Queue a usage row
+
+        Args:
+            shop_domain: Shop domain
+            metric_name: Metric name (e.g. 'api_calls')
+            metric_value: Metric value
+            metric_data: Extra JSON data (optional)
+        """
+        self._pending.append(
+            {
+                "shop_domain": shop_domain,
+                "metric_name": metric_name,
+                "metric_value": metric_value,
+                "metric_data": metric_data,
+                "date": datetime.utcnow(),  # When the usage happened
+            }
+        )
+        self._trim()
+
+    def _trim(self):
+        """Drop the oldest rows beyond max_pending"""
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped += overflow
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> int:
+        """
+        Insert a batch, or row by row if the database rejects it
+
+        Each row then gets its own savepoint: rejected rows are dropped and
+        the rest commit together.
+
+        Returns:
+            int: Number of rows written
+
+        Raises:
+            Exception: Any other database error (nothing was written)
+        """
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(insert(ShopUsage), batch)
+            return len(batch)
+        except (DataError, IntegrityError) as e:
+            logger.warning(
+                "Usage batch of %d rows rejected, retrying row by row: %s",
+                len(batch),
+                e,
+            )
+
+        rejected = 0
+        async with engine.begin() as conn:
+            for row in batch:
+                try:
+                    async with conn.begin_nested():
+                        await conn.execute(insert(ShopUsage), [row])
+                except (DataError, IntegrityError) as e:
+                    rejected += 1
+                    logger.error(
+                        "Dropping usage row %s for %s: %s",
+                        row["metric_name"],
+                        row["shop_domain"],
+                        e,
+                    )
+        self.rejected += rejected
+        return len(batch) - rejected
+
+    async def flush(self) -> int:
+        """
+        Insert pending rows in batches
+
+        Returns:
+            int: Number of rows written
+        """
+        written = 0
+        while self._pending:
+            batch = self._pending[: self.batch_size]
+            del self._pending[: self.batch_size]
+
+            try:
+                written += await self._write(batch)
+            except Exception as e:
+                logger.error("Failed to write %d usage rows: %s", len(batch), e)
+                # Put the batch back for the next flush, still within the limit
+                self._pending[:0] = batch
+                self._trim()
+                break
+        return written
+
+    async def _run(self):
+        """Flush loop"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flush task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write anything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+# Global writer instance
+usage_writer = UsageWriter(
+    flush_interval=settings.usage_flush_interval_seconds,
+    batch_size=settings.usage_batch_size,
+    max_pending=settings.usage_max_pending,
+)
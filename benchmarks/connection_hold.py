@@ -0,0 +1,144 @@
+"""
+Benchmark: holding a pooled DB connection across a slow outbound call
+versus the short read -> network call -> short write pattern.
+
+Each simulated request does what the product routes do:
+
+- hold:     read credentials, wait for "Shopify" (connection still checked
+            out in an open transaction), insert a usage row, commit
+- release:  read credentials on a connection that is returned right away,
+            wait for "Shopify", queue the usage row for a batched writer
+
+Only SELECT 1 statements are used, so any database reachable with
+DATABASE_URL works and nothing is written.
+
+Usage:
+    python -m benchmarks.connection_hold --requests 500 --concurrency 100 \\
+        --latency 0.5 --pool-size 10
+"""
+
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+
+async def hold_request(engine, latency: float):
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))  # Credentials
+        await asyncio.sleep(latency)  # Shopify call, transaction still open
+        await conn.execute(text("SELECT 1"))  # Usage insert
+        await conn.commit()
+
+
+async def release_request(engine, latency: float, pending: list):
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))  # Credentials
+    await asyncio.sleep(latency)  # Shopify call, no connection held
+    pending.append(1)  # Usage row for the batched writer
+
+
+async def flush_loop(engine, pending: list, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        if pending:
+            pending.clear()
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))  # One multi-row insert
+                await conn.commit()
+
+
+async def run(mode: str, args) -> dict:
+    engine = create_async_engine(
+        args.database_url,
+        pool_size=args.pool_size,
+        max_overflow=0,
+        pool_timeout=args.pool_timeout,
+    )
+    pending: list = []
+    flusher = None
+    if mode == "release":
+        flusher = asyncio.create_task(flush_loop(engine, pending, 1.0))
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    timeouts = 0
+    peak_checked_out = 0
+
+    async def one():
+        nonlocal timeouts
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if mode == "hold":
+                    await hold_request(engine, args.latency)
+                else:
+                    await release_request(engine, args.latency, pending)
+            except PoolTimeoutError:
+                timeouts += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    # Warm the pool
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+    async def sample_pool():
+        nonlocal peak_checked_out
+        while True:
+            peak_checked_out = max(peak_checked_out, engine.pool.checkedout())
+            await asyncio.sleep(0.01)
+
+    sampler = asyncio.create_task(sample_pool())
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    sampler.cancel()
+    if flusher is not None:
+        flusher.cancel()
+    await engine.dispose()
+
+    latencies.sort()
+
+    def quantile(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    return {
+        "mode": mode,
+        "ok": len(latencies),
+        "pool_timeouts": timeouts,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(quantile(0.5) * 1000, 1) if latencies else None,
+        "p99_ms": round(quantile(0.99) * 1000, 1) if latencies else None,
+        "mean_ms": (
+            round(statistics.mean(latencies) * 1000, 1) if latencies else None
+        ),
+        "peak_checked_out": peak_checked_out,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.5, help="Shopify call")
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--pool-timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("Set DATABASE_URL or pass --database-url")
+
+    for mode in ("hold", "release"):
+        result = asyncio.run(run(mode, args))
+        print("  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
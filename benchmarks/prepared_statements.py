@@ -0,0 +1,115 @@
+"""
+Benchmark: throughput of a parameterized query with and without psycopg's
+server-side prepared statements.
+
+Each mode runs the same catalog query (joins with non-trivial planning cost,
+like the app's shop lookups) with varying parameters over a pooled async
+engine:
+
+- disabled:  prepare_threshold=None, every execution is parsed and planned
+- prepared:  prepare_threshold=N, the statement is prepared per connection
+             after N executions and later executions skip parse/plan
+
+SQLAlchemy's compiled cache is warm in both modes, so the difference is the
+server-side parse and plan work. Only catalog tables are read, so any
+database reachable with DATABASE_URL works and nothing is written.
+
+Usage:
+    python -m benchmarks.prepared_statements --requests 20000 \\
+        --concurrency 20 --pool-size 10 --threshold 2
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+QUERY = text(
+    """
+    SELECT c.relname, n.nspname, count(a.attnum) AS columns
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0
+    WHERE n.nspname = :schema AND c.relkind = :kind AND c.relname LIKE :prefix
+    GROUP BY c.relname, n.nspname
+    ORDER BY c.relname
+    LIMIT :limit
+    """
+)
+
+PARAMS = [
+    {"schema": "pg_catalog", "kind": "r", "prefix": f"pg_{letter}%", "limit": 10}
+    for letter in "acdefilnoprstu"
+]
+
+
+async def run(mode: str, args) -> dict:
+    engine = create_async_engine(
+        args.database_url,
+        pool_size=args.pool_size,
+        max_overflow=0,
+        connect_args={
+            "prepare_threshold": args.threshold if mode == "prepared" else None
+        },
+    )
+
+    # Open every pooled connection and run past the threshold on each one
+    async def warm():
+        async with engine.connect() as conn:
+            for params in PARAMS[: args.threshold + 1]:
+                await conn.execute(QUERY, params)
+
+    await asyncio.gather(*(warm() for _ in range(args.pool_size)))
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            async with engine.connect() as conn:
+                await conn.execute(QUERY, PARAMS[i % len(PARAMS)])
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    latencies.sort()
+
+    def quantile(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    return {
+        "mode": mode,
+        "queries": len(latencies),
+        "throughput_qps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(quantile(0.5) * 1000, 3),
+        "p99_ms": round(quantile(0.99) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--threshold", type=int, default=2)
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("Set DATABASE_URL or pass --database-url")
+
+    for mode in ("disabled", "prepared"):
+        result = asyncio.run(run(mode, args))
+        print("  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""app_settings jsonb with settings_version
+
+Revision ID: 3c1f9a2b7d4e
+Revises: 70bdc21ad280
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f9a2b7d4e'
+down_revision: Union[str, None] = '70bdc21ad280'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        'shops',
+        'app_settings',
+        type_=postgresql.JSONB(astext_type=sa.Text()),
+        existing_type=postgresql.JSON(astext_type=sa.Text()),
+        existing_nullable=True,
+        postgresql_using='app_settings::jsonb',
+    )
+    op.add_column(
+        'shops',
+        sa.Column('settings_version', sa.Integer(), server_default='0', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('shops', 'settings_version')
+    op.alter_column(
+        'shops',
+        'app_settings',
+        type_=postgresql.JSON(astext_type=sa.Text()),
+        existing_type=postgresql.JSONB(astext_type=sa.Text()),
+        existing_nullable=True,
+        postgresql_using='app_settings::json',
+    )
@@ -0,0 +1,28 @@
+"""webhook_events requeued_at claim for the maintenance sweeper
+
+Revision ID: 5e2b8c7f1a90
+Revises: 3c1f9a2b7d4e
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2b8c7f1a90'
+down_revision: Union[str, None] = '3c1f9a2b7d4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'webhook_events',
+        sa.Column('requeued_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('webhook_events', 'requeued_at')
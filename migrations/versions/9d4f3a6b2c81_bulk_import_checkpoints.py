@@ -0,0 +1,35 @@
+"""bulk_import_checkpoints table
+
+Revision ID: 9d4f3a6b2c81
+Revises: 5e2b8c7f1a90
+Create Date: 2026-10-19 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4f3a6b2c81'
+down_revision: Union[str, None] = '5e2b8c7f1a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'bulk_import_checkpoints',
+        sa.Column('source', sa.String(length=1024), nullable=False),
+        sa.Column('table_name', sa.String(length=100), nullable=False),
+        sa.Column('records', sa.BigInteger(), nullable=False),
+        sa.Column('merged', sa.BigInteger(), nullable=False),
+        sa.Column(
+            'updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False
+        ),
+        sa.PrimaryKeyConstraint('source', 'table_name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('bulk_import_checkpoints')
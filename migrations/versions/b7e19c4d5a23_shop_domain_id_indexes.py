@@ -0,0 +1,47 @@
+"""(shop_domain, id) indexes on shop_usage and webhook_events
+
+Revision ID: b7e19c4d5a23
+Revises: 9d4f3a6b2c81
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e19c4d5a23'
+down_revision: Union[str, None] = '9d4f3a6b2c81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so ingest is not blocked on large tables
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_shop_usage_shop_domain_id',
+            'shop_usage',
+            ['shop_domain', 'id'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_webhook_events_shop_domain_id',
+            'webhook_events',
+            ['shop_domain', 'id'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_webhook_events_shop_domain_id',
+            table_name='webhook_events',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_shop_usage_shop_domain_id',
+            table_name='shop_usage',
+            postgresql_concurrently=True,
+        )
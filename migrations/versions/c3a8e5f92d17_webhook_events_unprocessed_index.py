@@ -0,0 +1,39 @@
+"""partial index on pending webhook_events
+
+Revision ID: c3a8e5f92d17
+Revises: b7e19c4d5a23
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a8e5f92d17'
+down_revision: Union[str, None] = 'b7e19c4d5a23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Only pending events are indexed, so it stays small however large the
+    # table grows. Built concurrently so ingest is not blocked.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_webhook_events_unprocessed',
+            'webhook_events',
+            ['received_at'],
+            postgresql_where=sa.text('processed = false AND error_message IS NULL'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_webhook_events_unprocessed',
+            table_name='webhook_events',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,49 @@
+"""unique webhook_id on webhook_events
+
+Revision ID: e4b7d2a9c610
+Revises: c3a8e5f92d17
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7d2a9c610'
+down_revision: Union[str, None] = 'c3a8e5f92d17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Redelivered webhooks stored before this revision: keep the id on the
+    # first copy only (the rows themselves are kept)
+    op.execute(
+        sa.text(
+            'UPDATE webhook_events AS w SET webhook_id = NULL '
+            'WHERE w.webhook_id IS NOT NULL AND EXISTS ('
+            'SELECT 1 FROM webhook_events AS f '
+            'WHERE f.webhook_id = w.webhook_id AND f.id < w.id)'
+        )
+    )
+
+    # Commits the UPDATE first
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_webhook_events_webhook_id',
+            'webhook_events',
+            ['webhook_id'],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_webhook_events_webhook_id',
+            table_name='webhook_events',
+            postgresql_concurrently=True,
+        )